@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from gas_index import GAS_COLUMNS
+from trend_aggregation import is_aggregate
+
+VALUE = "Total GHG emitted"
+
+# Gas column -> label used in the dashboard
+GASES = {
+    VALUE: "Total GHG",
+    "Annual CO2 emissions": "Carbon dioxide",
+    "Annual nitrous oxide emissions in CO2 equivalents": "Nitrous oxide",
+    "Annual methane emissions in CO2 equivalents": "Methane",
+}
+
+# Metric -> (label, whether values are fractions shown as percentages)
+METRICS = {
+    "percent_change": ("Percent Difference", True),
+    "cagr": ("Compound Annual Growth Rate", True),
+    "delta": ("Difference", False),
+    "rolling_delta": ("Average Annual Change", False),
+}
+
+
+class EmissionsAnalytics:
+    """Change metrics over the whole gas x country x year cube of the panel.
+
+    Every metric is one vectorized operation over all countries, and the top/bottom
+    k are picked with argpartition, so any base/target window is answered without
+    sorting or building DataFrames per request. Aggregates (World, continents, income
+    groups; see trend_aggregation.is_aggregate) are left out.
+    """
+
+    def __init__(self, panel):
+        panel = panel[~is_aggregate(panel["ADM0_A3"])]
+        rows, self.countries = pd.factorize(panel["ADMIN"], sort=True)
+        cols, years = pd.factorize(panel["Year"], sort=True)
+        self.years = np.asarray(years, dtype=np.int64)
+        self.gases = [VALUE, *GAS_COLUMNS]
+
+        self.cube = np.full((len(self.gases), len(self.countries), len(self.years)), np.nan)
+        self.cube[:, rows, cols] = panel[self.gases].to_numpy(dtype=np.float64).T
+
+    def _column(self, year):
+        i = np.searchsorted(self.years, year)
+        if i == len(self.years) or self.years[i] != year:
+            raise KeyError(f"no data for {year}")
+        return i
+
+    def _window(self, gas, base, target):
+        values = self.cube[self.gases.index(gas)]
+        return values[:, self._column(base)], values[:, self._column(target)]
+
+    def delta(self, gas, base, target):
+        start, end = self._window(gas, base, target)
+        return end - start
+
+    def percent_change(self, gas, base, target):
+        start, end = self._window(gas, base, target)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(start > 0, (end - start) / start, np.nan)
+
+    def cagr(self, gas, base, target):
+        start, end = self._window(gas, base, target)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where((start > 0) & (end > 0), end / start, np.nan)
+            return ratio ** (1.0 / (target - base)) - 1.0
+
+    def rolling_delta(self, gas, base, target):
+        """Mean change per year over the window, i.e. the delta spread over target - base years."""
+        return self.delta(gas, base, target) / (target - base)
+
+    def compute(self, metric, gas, base, target):
+        return getattr(self, metric)(gas, base, target)
+
+    @staticmethod
+    def top_k(values, k=5):
+        """Return the indices of the k lowest and k highest finite values, each sorted ascending."""
+        finite = np.flatnonzero(np.isfinite(values))
+        k = min(k, len(finite))
+        if k == 0:
+            return finite, finite
+        low = finite[np.argpartition(values[finite], k - 1)[:k]]
+        high = finite[np.argpartition(values[finite], len(finite) - k)[-k:]]
+        return low[np.argsort(values[low])], high[np.argsort(values[high])]
+
+    def extremes(self, metric, gas, base, target, k=5):
+        """The k lowest and k highest countries for a metric, as ADMIN and metric columns."""
+        values = self.compute(metric, gas, base, target)
+        low, high = self.top_k(values, k)
+        picked = np.concatenate([low, high[~np.isin(high, low)]])
+        return pd.DataFrame({"ADMIN": self.countries[picked], metric: values[picked]})
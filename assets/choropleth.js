@@ -0,0 +1,67 @@
+// Client-side year switching for the choropleth map.
+// The map geometry is sent once with the initial figure; moving the year slider
+// only swaps the z values, read from the float32 matrix kept in the 'year-values' store.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    choropleth: {
+        set_year: function(year, figure, store) {
+            if (!figure || !store || !figure.data || !figure.data.length) {
+                return window.dash_clientside.no_update;
+            }
+
+            // Decode the base64 matrix once and keep it until the store changes
+            var cache = window._ghgYearValues;
+            if (!cache || cache.source !== store.values) {
+                var bin = atob(store.values);
+                var bytes = new Uint8Array(bin.length);
+                for (var i = 0; i < bin.length; i++) {
+                    bytes[i] = bin.charCodeAt(i);
+                }
+                var index = {};
+                store.locations.forEach(function(code, i) { index[code] = i; });
+                cache = {source: store.values, matrix: new Float32Array(bytes.buffer), index: index};
+                window._ghgYearValues = cache;
+            }
+
+            var row = store.years.indexOf(year);
+            if (row < 0) {
+                return window.dash_clientside.no_update;
+            }
+            var offset = row * store.locations.length;
+
+            var trace = figure.data[0];
+            var z = trace.locations.map(function(code) {
+                var i = cache.index[code];
+                if (i === undefined) {
+                    return null;
+                }
+                var value = cache.matrix[offset + i];
+                return isNaN(value) ? null : value;
+            });
+
+            var data = figure.data.slice();
+            data[0] = Object.assign({}, trace, {
+                z: z,
+                hovertemplate: (trace.hovertemplate || '').replace(/<br>[^<]*=%\{z\}/, '<br>' + year + '=%{z}')
+            });
+
+            var layout = Object.assign({}, figure.layout);
+            layout.title = Object.assign({}, layout.title, {
+                text: 'Choropleth Map of Total GHG Emissions per Country in ' + year
+            });
+            if (layout.coloraxis && layout.coloraxis.colorbar) {
+                layout.coloraxis = Object.assign({}, layout.coloraxis, {
+                    colorbar: Object.assign({}, layout.coloraxis.colorbar, {title: {text: String(year)}})
+                });
+            }
+            return Object.assign({}, figure, {data: data, layout: layout});
+        },
+
+        // Server mode: fetch the map's cached JSON text for a year (the /_figure/choropleth route)
+        fetch_year: function(year) {
+            var config = JSON.parse(document.getElementById('_dash-config').textContent);
+            return fetch(config.requests_pathname_prefix + '_figure/choropleth/' + year).then(function(response) {
+                return response.ok ? response.json() : window.dash_clientside.no_update;
+            });
+        }
+    }
+});
@@ -0,0 +1,197 @@
+"""Offline benchmark of the dashboard's startup path and callbacks.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+
+Times each startup stage on a fresh GHGData, then calls every callback over a
+grid of inputs (all years, every country, selections of 1/10/100 countries) and
+records latency percentiles, serialized figure bytes and peak RSS (of this process
+and of the largest loader process) as JSON. With
+--compare, exits non-zero when a metric regressed by more than --tolerance.
+"""
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+
+import numpy as np
+import plotly.utils
+
+import final
+from geometry_store import LEVELS
+from ghg_data import GHGData
+
+SELECTION_SIZES = (1, 10, 100)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS. With RUSAGE_CHILDREN it is the
+    # largest reaped child, e.g. a loader process that parsed a sheet or the shapefile.
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def serialize(figure):
+    # The map comes pre-encoded from the figure cache
+    if isinstance(figure, str):
+        return figure
+    return json.dumps(figure, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def summarize(latencies_ms, sizes):
+    latencies = np.asarray(latencies_ms)
+    return {
+        "calls": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "mean_bytes": float(np.mean(sizes)),
+        "max_bytes": int(max(sizes)),
+    }
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    figure = fn(*args)
+    built = time.perf_counter()
+    text = serialize(figure)
+    done = time.perf_counter()
+    return (built - start) * 1000, (done - built) * 1000, len(text)
+
+
+def bench_startup(data):
+    stages = {}
+
+    def stage(name, fn):
+        start = time.perf_counter()
+        fn()
+        stages[name] = (time.perf_counter() - start) * 1000
+
+    # The sources are read concurrently, so this stage is the wall clock of the slowest one
+    stage("sources", lambda: data.sources.wait())
+    stage("df_GHG_per_gas", lambda: data.df_GHG_per_gas)
+    stage("GHGtrend", lambda: data.GHGtrend)
+    stage("df_GHG_per_gas_tidy", lambda: data.df_GHG_per_gas_tidy)
+    stage("zaworld", lambda: data.zaworld)
+    stage("merged_df", lambda: data.merged_df)
+    for level in LEVELS:
+        stage(f"geojson-{level}", lambda level=level: data.geojson(level))
+    stage("year_values", lambda: data.year_values)
+    stage("gas_breakdown", lambda: data.gas_breakdown)
+    stage("trend_matrix", lambda: data.trend_matrix)
+    stage("line_chart_all", lambda: final.line_chart_all(data))
+    stage("diverging_bar_chart", lambda: final.diverging_bar_chart(data))
+    stages["total"] = sum(stages.values())
+    return {"stages_ms": stages, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_callback(calls):
+    build, encode, sizes = [], [], []
+    for fn, *args in calls:
+        b, e, n = time_call(fn, *args)
+        build.append(b)
+        encode.append(e)
+        sizes.append(n)
+    result = summarize(np.add(build, encode), sizes)
+    result["build_p50_ms"] = float(np.percentile(build, 50))
+    result["serialize_p50_ms"] = float(np.percentile(encode, 50))
+    return result
+
+
+def bench_callbacks(data, repeat, seed):
+    rng = random.Random(seed)
+    results = {}
+
+    # Cold: the figure cache is emptied first, so every year is built; warm: every year is a hit
+    final.figure_cache(data).clear()
+    years = [(final.choropleth_json, data, year) for year in data.years]
+    results["update_choropleth_map/cold"] = bench_callback(years)
+    results["update_choropleth_map/warm"] = bench_callback(years * repeat)
+
+    # Clicks carry the feature's ADM0_A3 code, as the map sends them; only countries with panel data
+    countries = data.country_index
+    clicks = [
+        (final.update_stacked_bar_chart, data, {"points": [{"location": code}]})
+        for code, name in zip(countries.codes, countries.panel_names) if name in data.gas_breakdown
+    ]
+    results["update_stacked_bar_chart"] = bench_callback(clicks * repeat)
+
+    countries = list(data.GHGtrend["ADMIN"].unique())
+    for size in SELECTION_SIZES:
+        selections = [rng.sample(countries, min(size, len(countries))) for _ in range(20)]
+        calls = [(final.update_line_chart, data, selection) for selection in selections]
+        # Cold: the selection memo is emptied first, so every figure is built; warm: every call is a memo hit
+        data.trend_matrix.clear()
+        results[f"update_line_chart/{size}/cold"] = bench_callback(calls)
+        results[f"update_line_chart/{size}/warm"] = bench_callback(calls * repeat)
+
+    # Every metric and gas over windows ending in the latest year
+    windows = [(base, data.years[-1]) for base in data.years[:-1:5]]
+    calls = [
+        (final.update_diverging_bar_chart, data, base, target, gas, metric)
+        for base, target in windows for gas in final.GASES for metric in final.METRICS
+    ]
+    results["update_diverging_bar_chart"] = bench_callback(calls * repeat)
+
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Return the metrics that got worse than baseline by more than tolerance (a fraction)."""
+    regressions = []
+
+    def walk(cur, base, path):
+        for key, value in cur.items():
+            if key not in base:
+                continue
+            if isinstance(value, dict):
+                walk(value, base[key], f"{path}{key}/")
+            elif not isinstance(value, (int, float)):
+                continue
+            elif key.endswith(("_ms", "_bytes", "_mb")) or path.endswith("stages_ms/"):
+                if base[key] > 0 and value > base[key] * (1 + tolerance):
+                    regressions.append(f"{path}{key}: {base[key]:.2f} -> {value:.2f}")
+
+    walk(current, baseline, "")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a regression is reported")
+    parser.add_argument("--repeat", type=int, default=3, help="times each callback input grid is replayed")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random country selections")
+    args = parser.parse_args(argv)
+
+    data = GHGData()
+    results = {
+        "startup": bench_startup(data),
+        "callbacks": bench_callbacks(data, args.repeat, args.seed),
+        "figure_cache": final.figure_cache(data).stats(),
+    }
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["loader_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
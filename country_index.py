@@ -0,0 +1,97 @@
+import numpy as np
+import shapely
+
+# Natural Earth attributes kept for the index; every name column becomes an alias
+COUNTRY_ATTRIBUTES = ["ADM0_A3", "ADMIN", "ISO_A3", "NAME", "NAME_LONG", "FORMAL_EN"]
+ALIAS_COLUMNS = ["ADMIN", "NAME", "NAME_LONG", "FORMAL_EN"]
+
+
+def _key(name):
+    return str(name).strip().casefold()
+
+
+class CountryIndex:
+    """Integer identity for every country, with name/code maps and a spatial index.
+
+    Ids are positions in the Natural Earth attribute table. ADM0_A3 is the
+    canonical key (it is what the map's locations and the panel share); ISO_A3,
+    the Natural Earth names and the panel's own ADMIN spelling are aliases.
+    """
+
+    def __init__(self, attributes, geometries, panel=None):
+        self.codes = attributes["ADM0_A3"].astype(str).to_numpy()
+        self.admins = attributes["ADMIN"].astype(str).to_numpy()
+        self.by_code = {code: i for i, code in enumerate(self.codes)}
+
+        self.by_iso = {}
+        if "ISO_A3" in attributes:
+            for i, iso in enumerate(attributes["ISO_A3"].astype(str)):
+                if iso != "-99":
+                    self.by_iso.setdefault(iso, i)
+
+        self.aliases = {}
+        for column in ALIAS_COLUMNS:
+            if column in attributes:
+                for i, name in enumerate(attributes[column]):
+                    if isinstance(name, str) and name:
+                        self.aliases.setdefault(_key(name), i)
+
+        # The panel spells some countries differently from Natural Earth
+        # ("United States" vs "United States of America"); its name wins for data lookups
+        self.panel_names = self.admins.copy()
+        if panel is not None:
+            pairs = panel[["ADM0_A3", "ADMIN"]].drop_duplicates("ADM0_A3")
+            for code, name in zip(pairs["ADM0_A3"].astype(str), pairs["ADMIN"].astype(str)):
+                i = self.by_code.get(code)
+                if i is not None:
+                    self.panel_names[i] = name
+                    self.aliases.setdefault(_key(name), i)
+
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def lookup(self, name_or_code):
+        """Return the id for an ADM0_A3 code, an ISO_A3 code or any known name, or None."""
+        if name_or_code is None:
+            return None
+        text = str(name_or_code)
+        code = text.strip().upper()
+        if code in self.by_code:
+            return self.by_code[code]
+        if code in self.by_iso:
+            return self.by_iso[code]
+        return self.aliases.get(_key(text))
+
+    def locate(self, lat, lon):
+        """Return the id of the country containing the point, or None (point-in-polygon)."""
+        hits = self.tree.query(shapely.Point(lon, lat), predicate="intersects")
+        return int(hits.min()) if len(hits) else None
+
+    def locate_many(self, lats, lons):
+        """Vectorized locate; returns an int array with -1 where no country matches."""
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        point_index, geometry_index = self.tree.query(points, predicate="intersects")
+        out = np.full(len(points), -1, dtype=np.int64)
+        # A point on a shared border gets one of the touching countries
+        out[point_index] = geometry_index
+        return out
+
+    def resolve_click(self, point):
+        """Return the id for a Plotly click/hover point of the choropleth, or None.
+
+        The map's locations are ADM0_A3 codes, so point['location'] resolves
+        directly; the hover text (the ADMIN name) is a fallback.
+        """
+        for field in ("location", "hovertext"):
+            i = self.lookup(point.get(field))
+            if i is not None:
+                return i
+        if "lat" in point and "lon" in point:
+            return self.locate(point["lat"], point["lon"])
+        return None
+
+    def describe(self, i):
+        return {"id": int(i), "ADM0_A3": self.codes[i], "ADMIN": self.admins[i], "panel_name": self.panel_names[i]}
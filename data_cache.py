@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+from instrumentation import log
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # the cache is optional, we fall back to reading the workbook
+    pa = None
+    feather = None
+
+# Where converted sheets are kept, one Arrow file per (workbook content, sheet)
+CACHE_DIR = os.environ.get("GHG_CACHE_DIR", ".cache")
+
+
+# Hash the workbook contents so an edited file never reuses a stale cache.
+# The digest is remembered per (path, size, mtime) so repeated reads in the same
+# process don't hash the file again.
+_digests = {}
+
+
+def workbook_digest(path):
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key not in _digests:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _digests[key] = h.hexdigest()[:16]
+    return _digests[key]
+
+
+def cache_path(path, sheet_name):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    sheet = re.sub(r"[^A-Za-z0-9]+", "_", str(sheet_name)).strip("_")
+    return os.path.join(CACHE_DIR, f"{stem}-{sheet}-{workbook_digest(path)}.arrow")
+
+
+def is_cached(path, sheet_name):
+    """Whether read_sheet would be served from the Arrow cache (a memory map, not an Excel parse)."""
+    return feather is not None and os.path.exists(cache_path(path, sheet_name))
+
+
+# Arrow only allows string column names, so integer column names (the year
+# columns of a wide sheet) are written as strings and restored on read
+def _to_table(df):
+    int_columns = [str(c) for c in df.columns if isinstance(c, int)]
+    out = df.reset_index(drop=True)
+    out.columns = [str(c) for c in out.columns]
+    table = pa.Table.from_pandas(out, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[b"ghg_int_columns"] = json.dumps(int_columns).encode()
+    return table.replace_schema_metadata(meta)
+
+
+def _from_table(table):
+    meta = table.schema.metadata or {}
+    int_columns = set(json.loads(meta.get(b"ghg_int_columns", b"[]")))
+    df = table.to_pandas()
+    df.columns = [int(c) if c in int_columns else c for c in df.columns]
+    return df
+
+
+def read_sheet(path, sheet_name, columns=None):
+    """Read one sheet of an Excel workbook, or only some of its columns, going through the Arrow cache when possible."""
+    if feather is None:
+        return pd.read_excel(path, sheet_name=sheet_name, usecols=columns)
+
+    target = cache_path(path, sheet_name)
+    if os.path.exists(target):
+        # Uncompressed Arrow files are memory mapped, so only the requested columns are
+        # read from disk (to_pandas still copies them into this process)
+        names = None if columns is None else [str(c) for c in columns]
+        return _from_table(feather.read_table(target, columns=names, memory_map=True))
+
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    try:
+        table = _to_table(df)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never see a partial cache
+        tmp = f"{target}.{os.getpid()}.tmp"
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, target)
+    except (OSError, pa.ArrowException) as e:
+        log.warning("Could not cache %r: %s", sheet_name, e)
+    # The whole sheet is cached so any later column selection can be served from it
+    return df if columns is None else df[list(columns)]
+
+
+# Convert the sheets ahead of time, e.g. from a deploy step: python data_cache.py
+if __name__ == "__main__":
+    import sys
+
+    workbook = sys.argv[1] if len(sys.argv) > 1 else "GHGperGas_Cleaned.xlsx"
+    for name in ("Panel Total ghg",):
+        read_sheet(workbook, name)
+        print(f"Cached {name!r} -> {cache_path(workbook, name)}")
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from instrumentation import log
+
+
+class FigureCache:
+    """Bounded LRU cache of serialized figures, with an optional on-disk tier.
+
+    Both tiers keep the JSON text, so a hit is returned as is, without encoding
+    the figure again (see the pre-encoded /_figure routes in final.py). The disk
+    tier lets several gunicorn workers pointed at the same directory build each
+    figure only once between them.
+    """
+
+    def __init__(self, maxsize=64, disk_dir=None):
+        self.maxsize = maxsize
+        self.disk_dir = disk_dir
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.json")
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._items[key] = text
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key, build):
+        """Return the figure JSON text for key, calling build() (which returns a Figure) on a miss."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, text)
+                return text
+
+        with self._lock:
+            self.misses += 1
+        text = build().to_json()
+        if self.disk_dir:
+            target = self._disk_path(key)
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp, target)
+            except OSError as e:
+                log.warning("Could not write figure cache entry: %s", e)
+        self._remember(key, text)
+        return text
+
+    def warm(self, keys, build):
+        # build is called as build(*key[1:]) so keys can be (name, arg, ...) tuples
+        for key in keys:
+            self.get(key, lambda key=key: build(*key[1:]))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._items),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
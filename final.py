@@ -1,366 +1,546 @@
-from dash import Dash, html, dcc, Input, Output
-import pandas as pd
-import geopandas as gpd
-import plotly.express as px
-import plotly.graph_objects as go
-import dash_bootstrap_components as dbc
-
-# Set your Mapbox access token here
-px.set_mapbox_access_token(open(".mapbox_token").read())
-
-# Load the data and perform necessary operations
-df_GHG_per_gas = pd.read_excel('GHGperGas_Cleaned.xlsx', sheet_name='Panel Total ghg')
-df_GHG_diff = pd.read_excel('GHGperGas_Cleaned.xlsx', sheet_name='Difference not panel')
-print("Succesfully loaded data")
-
-# Replace 'Entity' with 'ADMIN' in the GHGtrend DataFrame
-GHGtrend = df_GHG_per_gas.groupby(['Year', 'ADMIN'])['Total GHG emitted'].sum().reset_index()
-print("Succesfully loaded GHGtrend")
-
-# Sorting the DataFrame by the 'Diff percent' column in ascending order
-df_sorted = df_GHG_diff.sort_values(by='Diff percent')
-print("Succesfully loaded df_sorted")
-
-# Select the top 5 lowest percent differences
-top_5_lowest = df_sorted.nsmallest(5, 'Diff percent')
-print("Succesfully loaded top_5_lowest")
-
-
-# Select the top 5 highest percent differences
-top_5_highest = df_sorted.nlargest(5, 'Diff percent')
-print("Succesfully loaded top_5_highest")
-
-# Concatenate the two DataFrames to get the final result with only the top 5 highest and top 5 lowest percent differences
-df_5lowhigh = pd.concat([top_5_lowest, top_5_highest])
-print("Succesfully concatenated low and high")
-
-# Reshape the panel data to a tidy format
-df_GHG_per_gas_tidy = df_GHG_per_gas.pivot_table(index='ADM0_A3', columns='Year', values='Total GHG emitted').reset_index()
-print("Succesfully pivoted gas_tidy")
-
-# Load geospatial data
-zaworld = gpd.read_file('/Users/alfonsoreyes/Documents/Projects/DATA101 Project/datasetss')
-print("Succesfully loaded zaworld")
-
-# Merge GHG data with geospatial data
-merged_df = zaworld.merge(df_GHG_per_gas_tidy, on='ADM0_A3', how='left')
-print("Succesfully merged the two")
-
-# Convert to geojson format
-geojson = merged_df.geometry.__geo_interface__
-print("Succesfully converted df to geojson")
-
-# Initialize Dash application
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-
-print("Succesfully initialized dash")
-
-# Create the choropleth map function
-def create_choropleth_map(selected_year):
-    fig = px.choropleth_mapbox(
-    merged_df,
-    geojson=geojson,  # Use the valid GeoJSON format
-    locations=merged_df.index,  # Use the index as identifier
-    color=selected_year,
-    hover_name='ADMIN',
-    mapbox_style="carto-positron",
-    zoom=1,
-    center={"lat": 37.0902, "lon": -95.7129}
-)
-    fig.update_layout(title=f"Choropleth Map of Total GHG Emissions per Country in {selected_year}")
-    return fig
-
-# Create the stacked bar chart function
-def create_stacked_bar_chart(selected_country):
-    # Filter data for the specific country
-    country_data = df_GHG_per_gas[df_GHG_per_gas["ADMIN"] == selected_country]
-
-    # Melt the DataFrame to the long format for a stacked bar chart
-    country_data_melted = country_data.melt(
-        id_vars=["Year", "ADMIN"],
-        value_vars=[
-            "Annual CO2 emissions",
-            "Annual nitrous oxide emissions in CO2 equivalents",
-            "Annual methane emissions in CO2 equivalents",
-        ],
-        var_name="Gas types",
-        value_name="Emissions",
-    )
-
-    # Create the stacked bar chart using Plotly
-    fig = px.bar(
-        country_data_melted,
-        x="Year",
-        y="Emissions",
-        color="Gas types",
-        title=f"GHG Emissions for {selected_country} (1970-2021)",
-        labels={"Year": "Year", "Emissions": "Emissions"},
-        barmode="stack",
-    )
-    fig.update_layout(
-        # margin=dict(l=20, r=20, t=80, b=20),
-        paper_bgcolor="White",
-    )
-    fig.update_layout(
-        width=int(750),
-        legend=dict(orientation="h", yanchor="bottom", y=-0.5, xanchor="right", x=1),
-    )
-
-    return fig
-
-# Create the diverging bar chart function
-def create_diverging_bar_chart():
-    # Assuming you have already created df_5lowhigh DataFrame and it contains the data for the top 5 lowest and highest emitters
-    positive_diff_df = df_5lowhigh[df_5lowhigh["Diff percent"] >= 0]
-    negative_diff_df = df_5lowhigh[df_5lowhigh["Diff percent"] < 0]
-
-    # Sort the DataFrames for the bar chart
-    positive_diff_df = positive_diff_df.sort_values(by='Diff percent', ascending=False)
-    negative_diff_df = negative_diff_df.sort_values(by='Diff percent', ascending=True)
-
-    # Create a figure
-    fig = go.Figure()
-
-    # Add the bars for positive percent differences
-    fig.add_trace(go.Bar(
-        x=positive_diff_df["Diff percent"],
-        y=positive_diff_df["ADMIN"],
-        orientation='h',
-        marker=dict(color='red'),  # Set color for positive differences
-        name='Positive Percent Difference'
-    ))
-
-    # Add the bars for negative percent differences
-    fig.add_trace(go.Bar(
-        x=negative_diff_df["Diff percent"],
-        y=negative_diff_df["ADMIN"],
-        orientation='h',
-        marker=dict(color='green'),  # Set color for negative differences
-        name='Negative Percent Difference'
-    ))
-
-    # Update the layout to display as a diverging bar chart
-    fig.update_layout(
-        title='Diverging Bar Chart of the top 5 countries with the highest negative and positive changes in emissions since 2015',
-        xaxis=dict(
-            tickformat="%", # Format x-axis tick labels as percentages
-            range=[-2, 2],  # Set the range of the x-axis from -100% to 100%
-            dtick=1,        # Set the interval between tick marks
-        ),
-        yaxis=dict(
-            automargin=True,  # Automatically adjust margin to fit the labels
-        ),
-        barmode='overlay',  # Use 'overlay' to overlay positive and negative bars
-        bargap=0.2,         # Adjust the gap between bars
-        bargroupgap=0.1,    # Adjust the gap between bar groups
-    )
-
-    return fig
-
-line_fig = px.line(
-                GHGtrend,
-                x="Year",
-                y="Total GHG emitted",
-                color="ADMIN",
-                title="Trend of Total GHG Emitted per Country",
-                markers=True,
-                category_orders={
-                    "ADMIN": GHGtrend.groupby("ADMIN")["Total GHG emitted"]
-                    .sum()
-                    .sort_values(ascending=False)
-                    .index
-                },
-            )
-
-print("Succesfully loaded all functions")
-
-# App layout
-app.layout = html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'margin': '1in', 'color': '#FFDEAD', 'background-color': '#e9f1f4', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-     html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("Visualizing the Fight Against Climate Change", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-    html.H5("Cudo, Hernandez, Lamberte, Reyes", style={'color': '#555', 'margin-bottom': '0.12in', 'font-style': 'italic', 'justify-content': 'center', 'padding': '10px'}),
-    html.P("Climate change is a pressing global issue we're facing, and it is impacting various parts of our lives. Shifts in growing seasons and water availability now make it harder for farmers to produce food. Coastal communities face threats from rising sea levels, leading to flooding and livelihood disruptions. Our warming and more acidic oceans harm marine life, biodiversity, and ecosystem stability. Climate change has now also worsened air quality and exacerbated heat-related illnesses, affecting public health. Combatting climate change is crucial for it affects everyone, and its effects are felt even more by vulnerable  communities.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '15px'}),
-    html.P("Greenhouse gases (GHGs) are the primary driver of climate change. When we burn fossil fuels, deforest land, and engage in certain industrial activities, we release significant amounts of greenhouse gases into the atmosphere. These gases act like a blanket, trapping heat and causing the Earth's temperature to rise, leading to global warming. This warming, in turn, triggers various consequences such as ones mentioned above.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '15px'}),
-    html.P([
-        "To address climate change's impacts by curbing GHG emissions",
-        html.Span(" we must first track and understand the general trend for global GHG emissions over the years.", style={'color': '#fd9372', 'margin-bottom': '0.12in', 'font-weight': 'bold'})
-    ], style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'} ),
-
-    html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("Line Chart as a whole", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-     dcc.Graph(id='line-chartall', figure=px.line(GHGtrend, x="Year", y="Total GHG emitted",
-                                              color="ADMIN",
-                                              title="Trend of Total GHG Emitted per Country",
-                                              markers=True,
-                                              category_orders={
-                                                  "ADMIN": GHGtrend.groupby("ADMIN")["Total GHG emitted"].sum().sort_values(ascending=False).index}
-                                              )
-               ),
-
-    html.P("It is hard to visualize the trend of GHG per country across the years so below is a line chart which can be filtired out! Play around with it for a bit.", style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'}),
-    html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("Line Chart with options", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-    # Line Chart from the first code
-    dcc.Dropdown(
-        id='country-dropdown',
-        options=[{'label': country, 'value': country} for country in GHGtrend['ADMIN'].unique()],
-        multi=True,
-        placeholder="Select countries...",
-        style={'width': '50%','color': 'black', 'padding': '10px'}
-    ),
-    dcc.Graph(id='line-chart'),
-
-
-     html.P("This line chart showcases the trends of GHG emissions on a global scale over several decades. The x-axis indicates the years or time periods studied, while the y-axis represents emission levels.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '15px'}),
-     html.P([
-        "On December 12, 2015, during COP21, The Paris Agreement was adopted. The Paris Agreement is a landmark international accord ratified by 196 countries and the EU, which specifically strives to limit the rise in global temperature below 2 degrees Celsius, with an aspirational target of only 1.5 degrees Celsius above pre-industrial levels through coordinated efforts to reduce GHG emissions. ", 
-        html.Span("This agreement represents a critical step in the fight against climate change.", style={'color': '#fd9372', 'font-weight': 'bold'})
-    ], style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'}),
-      html.P("This line chart clearly illustrates a general upward trajectory in GHG emissions projected for the upcoming years. This pronounced increase can be attributed to heightened investments, the effects of globalization, and the dynamics of international trade, as highlighted by Ahmed et al. (2022). However, the comprehensive policies outlined by the 2015 Paris Agreement have ushered nations towards a shared objective: to curtail the escalation of global temperature by maintaining a rise of less than 1.5°C.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '10px'}),
-      html.P([
-        "Achieving this crucial aim demands a significant reduction in the volume of greenhouse gas emissions produced by each country. Therefore, in the aftermath of 2015, we should anticipate witnessing a discernible shift among certain nations, marked by a substantial decrease in their emissions output. A desirable outcome would involve a greater number of countries achieving negative growth in their GHG emissions, as opposed to those registering a positive trajectory, or countries with negative growth should have a greater magnitude than those who have positive growth.",
-        html.Span(" This would be a testament to the collective efforts aimed at mitigating the surge in global temperatures, aligning with the ultimate goal of the Paris Agreement.", style={'color': '#fd9372', 'font-weight': 'bold'}),
-        " To see that, we take at the top 5 largest and top 5 lowest percent changes in total GHG emissions using 2015 as a base year and 2021 as the latest year."
-    ], style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'}),
-
-       html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("Diverging Bar Chart", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-
-    # Diverging Bar Chart for top 5 lowest and highest emitters
-    dcc.Graph(id='diverging-bar-chart', figure=create_diverging_bar_chart(), style={"width": "100%", "display": "inline-block"}),
-    
-
-         html.H1(html.Span("Oh no!", style={'color': '#fd9372', 'font-weight': 'bold', 'justify-content': 'center', 'text-align': 'center', 'padding': '10px'}), style={'text-align': 'center'}),
-         html.P(["It seems that the top 5 locations with a positive growth in GHG emissions have a greater magnitude as compared to those that have a negative growth rate. What is even worse is that most of these nations are either developing countries, which normally do not emit a lot of GHG in the first place, or countries that normally don’t have an advanced urban area enough to generate significant amounts of GHG like the ",
-         html.Span("Cook Islands!", style={'color': '#fd9372', 'font-weight': 'bold'})], style={'color': '#555', 'margin-bottom': '0.5in', 'justify-content': 'center', 'padding': '15px'} ),
-
-         html.H1(html.Span("However!", style={'color': '#fd9372', 'font-weight': 'bold', 'justify-content': 'center', 'text-align': 'center', 'padding': '15px'}), style={'text-align': 'center'}),
-         html.P(["Taking a look at the diverging dataset ", 
-         html.Span("may not give out the whole truth", style={'color': '#fd9372', 'font-weight': 'bold'}), 
-           " of the situation. After all, it only provides the top 5 biggest rates of change in both the positive and negative directions. Thus, it is important to visualize the GHG emissions of the whole world throughout periods of time (especially in 2015-2021). Thus, the choropleth map below showcases just that. You may be able to look at the GHG emitted per country over time. Colors closer to yellow represent high total GHG emitted and colors closer to purple represent the opposite. Check out the visualization below."], style={'color': '#555', 'justify-content': 'center', 'padding': '15px'}),
-
-         html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("The Gas Giants: Choropleth Map", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-   # Choropleth Map and stacked bar chart from the updated code
-        dbc.Row(
-            children=[
-                dbc.Col(
-                    children=[
-                        html.Div(
-                            dcc.Loading(
-                                id="map-loading",
-                                type="circle",
-                                children=dcc.Graph(
-                                    id="choropleth-map",
-                                    style={"width": "100%", "display": "inline-block"},
-                                ),
-                            ),
-                            style={
-                                "width": "100%",
-                                "display": "flex",
-                                "justify-content": "center",
-                            },
-                        )
-                    ],
-                    width=6,
-                ),
-                dbc.Col(
-                    children=[
-                        # Stacked Bar Chart for selected country from the updated code
-                        dcc.Loading(
-                            id="bar-loading",
-                            type="circle",
-                            children=dcc.Graph(
-                                id="stacked-bar-chart",
-                                style={"width": "50%", "display": "inline-block"},
-                            ),
-                        )
-                    ],
-                    width=4,
-                ),
-            ]
-        ),
-    
-    # Slider for selecting the year from the updated code
-    dcc.Slider(
-        id='year-slider',
-        min=df_GHG_per_gas['Year'].min(),
-        max=df_GHG_per_gas['Year'].max(),
-        value=df_GHG_per_gas['Year'].max(),
-        tooltip={"placement": "bottom", "always_visible": True},
-        marks=None,
-        step=1
-    ),
-
-    html.P("You may try clicking on a country from the choropleth map to showcase its decomposition of Green House Gasses in a stacked bar chart below", style={'color': '#fd9372', 'font-weight': 'bold', 'padding': '15px'}),
-    html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("The Carbon Cartel: Methane, Carbon Dioxide, and Nitrous Oxide", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-    html.P(["Compared to the line chart, the Choropleth map actually gives a clearer output of which countries are emitting how much GHG. Take note that this is total GHG. This is important because we want to see other countries, ",
-           html.Span("especially developed ones", style={'color': '#fd9372', 'font-weight': 'bold'}),
-           " because they have a considerable impact on a global scale."], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-    html.P("Based on the choropleth map, three obvious generalizations can be made: Developed and bigger countries like the USA and Brazil are one of the biggest contributors of GHG (1). Countries that emit the least amount of GHG are usually developing countries (2). The biggest contributor to GHG is China which is not surprising given its heavily industrial economy (3).", style={'color': '#555', 'margin-bottom': '0.5in',  'padding': '15px'}),
-    html.P(["It is evident, that as the choropleth map changes over the years, GHG emitted, especially for developed countries, ",
-           html.Span("gets larger and larger.", style={'color': '#fd9372', 'font-weight': 'bold'})], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-    html.P("That is quite concerning, but let's explore the situation further by visualizing the gas decomposition through a stacked bar chart. Various industries and specific circumstances within a country can influence the composition of the greenhouse gases they emit. Hence, understanding this decomposition can be instrumental in making informed policy decisions to effectively reduce their overall greenhouse gas emissions. ", style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-    
-
-   
-
-    html.P("Some countries have different compositions than others. One emits more methane, the other emits more carbon dioxide. It is important to know this because these gasses are emitted by various kinds of factors. Knowing those factors, countries can use them to create policies to efficiently reduce overall GHG emissions.", style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-    html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("Were the Paris Agreement goals achieved?", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-    html.P(["The ultimate end goal of the Paris Agreement was to reduce rising global temperatures under 1.5C. To do that, considerable amounts of effort are placed into reducing GHG emissions. Some countries have already contributed to this, others have yet to kickstart their programs, and others show no signs of reducing their emissions anytime soon. ",
-           html.Span("So it is hard to say even with this visualization. However, at the current level and data, it seems that progress is slow.", style={'color': '#fd9372', 'font-weight': 'bold'})], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-
-    html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
-    html.H1("Conclusion", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
-    html.P("Given such a time frame from 2015 to 2021, it cannot be said for certain that the Paris Agreement goals were achieved. Evidence from the visualizations shows that the majority of the countries continue to have rising emissions per year. We can only hope that this trend does not continue in the future.", style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-    html.P([
-        "Regardless of this, it is too early to say that the Paris Agreement goals were not reached. Policies ",
-        html.Span("take a lot of time to implement, and results are usually delayed or lagged in time.",
-                  style={'color': '#fd9372', 'font-weight': 'bold'}),
-        " This visualization, however, can just give ",
-        html.Span("a clear overview of the current situation with regard to it.",
-                  style={'color': '#fd9372', 'font-weight': 'bold'}),
-        " In the end, it is up to the policymakers and world leaders to decide to accelerate the reduction of GHG emission initiatives in the future."
-    ], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
-
-    ])
-
-# Callback to update the stacked bar chart based on the selected country from the choropleth map
-@app.callback(
-    Output('stacked-bar-chart', 'figure'),
-    Input('choropleth-map', 'clickData')
-)
-def update_stacked_bar_chart(click_data):
-    if click_data is None:
-        # If no country is clicked, show an empty figure
-        return px.bar()
-
-    selected_country = click_data['points'][0]['hovertext']
-    return create_stacked_bar_chart(selected_country)
-
-# Callback to update the choropleth map based on the selected year from the updated code
-@app.callback(
-    Output('choropleth-map', 'figure'),
-    Input('year-slider', 'value')
-)
-def update_choropleth_map(selected_year):
-    return create_choropleth_map(selected_year)
-
-@app.callback(
-    Output('line-chart', 'figure'),
-    [Input('country-dropdown', 'value')]
-)
-def update_line_chart(selected_countries):
-    if selected_countries:
-        filtered_df = GHGtrend[GHGtrend['ADMIN'].isin(selected_countries)].rename(columns={'ADMIN': 'Countries'})
-        fig = px.line(filtered_df, x='Year', y='Total GHG emitted', color='Countries', title="GHG Emission Over Time")
-    else:
-        fig = go.Figure()
-    return fig
-
-
-# Run the app
-if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction
+import plotly.express as px
+import plotly.graph_objects as go
+import dash_bootstrap_components as dbc
+import flask
+from analytics import GASES, METRICS
+from figure_cache import FigureCache
+from geometry_store import detail_for_zoom
+from ghg_data import GHGData
+from ingest import watch_inbox
+from instrumentation import SamplingProfiler, instrument_callback, metrics, span
+from shared_dataset import attach
+from trend_aggregation import aggregate_entities, rank_entities, regional_rollup, top_n_with_others, trend_figure
+import functools
+import ipaddress
+import json
+import logging
+import os
+
+# Nothing is loaded at import time: create_app() builds the Dash app, and every dataset
+# and figure is computed on first use through the GHGData products (see ghg_data.py).
+
+MAP_ZOOM = 1
+MAP_DETAIL = os.environ.get("GHG_MAP_DETAIL") or detail_for_zoom(MAP_ZOOM)
+MAP_STYLE = "carto-positron"
+
+# Year switching mode for the choropleth map:
+#   "client" sends the geometry once and lets the browser swap the per-year values (assets/choropleth.js)
+#   "server" rebuilds the figure (through the figure cache) on every slider move
+YEAR_SWITCH = os.environ.get("GHG_YEAR_SWITCH", "client")
+
+# Create the choropleth map function
+def create_choropleth_map(data, selected_year, detail=MAP_DETAIL, style=MAP_STYLE):
+    fig = px.choropleth_mapbox(
+    data.merged_df,
+    geojson=data.geojson(detail),  # Simplified GeoJSON at the requested level of detail
+    locations='ADM0_A3',  # Features in the geometry store are keyed by ADM0_A3
+    color=selected_year,
+    hover_name='ADMIN',
+    mapbox_style=style,
+    zoom=MAP_ZOOM,
+    center={"lat": 37.0902, "lon": -95.7129}
+)
+    fig.update_layout(title=f"Choropleth Map of Total GHG Emissions per Country in {selected_year}")
+    return fig
+
+# Create the stacked bar chart function
+def create_stacked_bar_chart(data, selected_country):
+    # Slice the country's Year x gas block out of the precomputed index (no DataFrame copies)
+    years, values = data.gas_breakdown.lookup(selected_country)
+
+    # One bar trace per gas, stacked
+    fig = go.Figure(
+        [go.Bar(x=years, y=values[:, i], name=gas) for i, gas in enumerate(data.gas_breakdown.gas_columns)]
+    )
+    fig.update_layout(
+        title=f"GHG Emissions for {selected_country} (1970-2021)",
+        xaxis_title="Year",
+        yaxis_title="Emissions",
+        legend_title_text="Gas types",
+        barmode="stack",
+    )
+    fig.update_layout(
+        # margin=dict(l=20, r=20, t=80, b=20),
+        paper_bgcolor="White",
+    )
+    fig.update_layout(
+        width=int(750),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.5, xanchor="right", x=1),
+    )
+
+    return fig
+
+# Create the diverging bar chart function
+def create_diverging_bar_chart(df_5lowhigh, value, label, title, xaxis=None):
+    # df_5lowhigh holds the top 5 lowest and highest countries for one metric (see EmissionsAnalytics.extremes)
+    positive_diff_df = df_5lowhigh[df_5lowhigh[value] >= 0]
+    negative_diff_df = df_5lowhigh[df_5lowhigh[value] < 0]
+
+    # Sort the DataFrames for the bar chart
+    positive_diff_df = positive_diff_df.sort_values(by=value, ascending=False)
+    negative_diff_df = negative_diff_df.sort_values(by=value, ascending=True)
+
+    # Create a figure
+    fig = go.Figure()
+
+    # Add the bars for positive percent differences
+    fig.add_trace(go.Bar(
+        x=positive_diff_df[value],
+        y=positive_diff_df["ADMIN"],
+        orientation='h',
+        marker=dict(color='red'),  # Set color for positive differences
+        name=f'Positive {label}'
+    ))
+
+    # Add the bars for negative percent differences
+    fig.add_trace(go.Bar(
+        x=negative_diff_df[value],
+        y=negative_diff_df["ADMIN"],
+        orientation='h',
+        marker=dict(color='green'),  # Set color for negative differences
+        name=f'Negative {label}'
+    ))
+
+    # Update the layout to display as a diverging bar chart
+    fig.update_layout(
+        title=title,
+        xaxis=xaxis or dict(
+            tickformat="%", # Format x-axis tick labels as percentages
+            range=[-2, 2],  # Set the range of the x-axis from -100% to 100%
+            dtick=1,        # Set the interval between tick marks
+        ),
+        yaxis=dict(
+            automargin=True,  # Automatically adjust margin to fit the labels
+        ),
+        barmode='overlay',  # Use 'overlay' to overlay positive and negative bars
+        bargap=0.2,         # Adjust the gap between bars
+        bargroupgap=0.1,    # Adjust the gap between bar groups
+    )
+
+    return fig
+
+# The all-countries line chart, built once and shared by every page load.
+# GHG_LINE_MODE picks how many traces it gets:
+#   "top"     the GHG_LINE_TOP_N largest emitters plus an "Others" band (default)
+#   "regions" one trace per UN region
+#   "all"     every country, drawn with WebGL
+LINE_MODE = os.environ.get("GHG_LINE_MODE", "top")
+LINE_TOP_N = int(os.environ.get("GHG_LINE_TOP_N", 10))
+
+def line_chart_all(data):
+    def build():
+        if LINE_MODE == "regions":
+            trend, order = regional_rollup(data.df_GHG_per_gas, data.regions)
+            title = "Trend of Total GHG Emitted per Region"
+        elif LINE_MODE == "all":
+            trend, order = data.GHGtrend, list(rank_entities(data.GHGtrend, exclude=aggregate_entities(data.df_GHG_per_gas)))
+            title = "Trend of Total GHG Emitted per Country"
+        else:
+            trend, order = top_n_with_others(data.GHGtrend, LINE_TOP_N, exclude=aggregate_entities(data.df_GHG_per_gas))
+            title = f"Trend of Total GHG Emitted per Country (top {LINE_TOP_N} and others)"
+        return trend_figure(trend, order, title=title, markers=LINE_MODE != "all")
+    return data.memo("line_fig", build)
+
+# Initial window, gas and metric of the diverging chart. The page's narrative was written
+# from a ranking of CO2 percent changes from 2015 to 2021.
+DIVERGING_DEFAULTS = {"base_year": 2015, "target_year": 2021, "gas": "Annual CO2 emissions", "metric": "percent_change"}
+
+def diverging_bar_chart(data):
+    # Built by the same engine as the callback, so the first control change never switches metric
+    return data.memo("diverging_fig", lambda: update_diverging_bar_chart(data, **DIVERGING_DEFAULTS))
+
+# Diverging bar chart for any window, gas and metric, computed by the analytics engine (analytics.py)
+def update_diverging_bar_chart(data, base_year, target_year, gas, metric):
+    if base_year is None or target_year is None or base_year >= target_year:
+        fig = go.Figure()
+        fig.update_layout(title="Pick a base year before the target year")
+        return fig
+
+    label, as_percent = METRICS[metric]
+    extremes = data.analytics.extremes(metric, gas, int(base_year), int(target_year))
+    return create_diverging_bar_chart(
+        extremes,
+        value=metric,
+        label=label,
+        title=f'Diverging Bar Chart of the top 5 countries with the highest negative and positive changes in {GASES[gas]} emissions from {base_year} to {target_year}',
+        xaxis=dict(tickformat="%" if as_percent else None, autorange=True),
+    )
+
+# Cache of serialized choropleth figures per (year, level of detail, style).
+# Set GHG_FIGURE_CACHE_DIR to share built figures between workers on the same node.
+def figure_cache(data):
+    def build():
+        cache_dir = os.environ.get("GHG_FIGURE_CACHE_DIR")
+        if cache_dir:
+            # Namespace the disk tier by data version so an updated workbook never serves stale figures
+            cache_dir = os.path.join(cache_dir, f"{data.workbook_key}-{data.geometry_key}")
+        return FigureCache(maxsize=int(os.environ.get("GHG_FIGURE_CACHE_SIZE", 64)), disk_dir=cache_dir)
+    return data.memo("figure_cache", build)
+
+def warm_figure_cache(data):
+    with span("warm_figure_cache"):
+        figure_cache(data).warm(
+            [("choropleth", year, MAP_DETAIL, MAP_STYLE) for year in data.years],
+            lambda *args: create_choropleth_map(data, *args),
+        )
+
+# The serialized map for a year, straight from the figure cache
+def choropleth_json(data, selected_year):
+    selected_year = int(selected_year)
+    return figure_cache(data).get(
+        ("choropleth", selected_year, MAP_DETAIL, MAP_STYLE),
+        lambda: create_choropleth_map(data, selected_year, MAP_DETAIL, MAP_STYLE),
+    )
+
+def update_choropleth_map(data, selected_year):
+    return json.loads(choropleth_json(data, selected_year))
+
+def update_stacked_bar_chart(data, click_data):
+    if click_data is None:
+        # If no country is clicked, show an empty figure
+        return px.bar()
+
+    # Resolve the clicked feature to a country id, then to the panel's name for it
+    countries = data.country_index
+    country = countries.resolve_click(click_data['points'][0])
+    if country is None:
+        return px.bar()
+    return create_stacked_bar_chart(data, countries.panel_names[country])
+
+def update_line_chart(data, selected_countries):
+    if selected_countries:
+        # Gather the selected rows of the precomputed trend matrix (recent selections are memoized)
+        fig = data.trend_matrix.figure(selected_countries)
+    else:
+        fig = go.Figure()
+    return fig
+
+# App layout, evaluated when the first page is served rather than at import
+def serve_layout(data):
+    return html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'margin': '1in', 'color': '#FFDEAD', 'background-color': '#e9f1f4', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+         html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("Visualizing the Fight Against Climate Change", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+        html.H5("Cudo, Hernandez, Lamberte, Reyes", style={'color': '#555', 'margin-bottom': '0.12in', 'font-style': 'italic', 'justify-content': 'center', 'padding': '10px'}),
+        html.P("Climate change is a pressing global issue we're facing, and it is impacting various parts of our lives. Shifts in growing seasons and water availability now make it harder for farmers to produce food. Coastal communities face threats from rising sea levels, leading to flooding and livelihood disruptions. Our warming and more acidic oceans harm marine life, biodiversity, and ecosystem stability. Climate change has now also worsened air quality and exacerbated heat-related illnesses, affecting public health. Combatting climate change is crucial for it affects everyone, and its effects are felt even more by vulnerable  communities.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '15px'}),
+        html.P("Greenhouse gases (GHGs) are the primary driver of climate change. When we burn fossil fuels, deforest land, and engage in certain industrial activities, we release significant amounts of greenhouse gases into the atmosphere. These gases act like a blanket, trapping heat and causing the Earth's temperature to rise, leading to global warming. This warming, in turn, triggers various consequences such as ones mentioned above.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '15px'}),
+        html.P([
+            "To address climate change's impacts by curbing GHG emissions",
+            html.Span(" we must first track and understand the general trend for global GHG emissions over the years.", style={'color': '#fd9372', 'margin-bottom': '0.12in', 'font-weight': 'bold'})
+        ], style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'} ),
+
+        html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("Line Chart as a whole", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+         dcc.Graph(id='line-chartall', figure=line_chart_all(data)),
+
+        html.P("It is hard to visualize the trend of GHG per country across the years so below is a line chart which can be filtired out! Play around with it for a bit.", style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'}),
+        html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("Line Chart with options", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+        # Line Chart from the first code
+        dcc.Dropdown(
+            id='country-dropdown',
+            options=[{'label': country, 'value': country} for country in data.GHGtrend['ADMIN'].unique()],
+            multi=True,
+            placeholder="Select countries...",
+            style={'width': '50%','color': 'black', 'padding': '10px'}
+        ),
+        dcc.Graph(id='line-chart'),
+
+
+         html.P("This line chart showcases the trends of GHG emissions on a global scale over several decades. The x-axis indicates the years or time periods studied, while the y-axis represents emission levels.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '15px'}),
+         html.P([
+            "On December 12, 2015, during COP21, The Paris Agreement was adopted. The Paris Agreement is a landmark international accord ratified by 196 countries and the EU, which specifically strives to limit the rise in global temperature below 2 degrees Celsius, with an aspirational target of only 1.5 degrees Celsius above pre-industrial levels through coordinated efforts to reduce GHG emissions. ", 
+            html.Span("This agreement represents a critical step in the fight against climate change.", style={'color': '#fd9372', 'font-weight': 'bold'})
+        ], style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'}),
+          html.P("This line chart clearly illustrates a general upward trajectory in GHG emissions projected for the upcoming years. This pronounced increase can be attributed to heightened investments, the effects of globalization, and the dynamics of international trade, as highlighted by Ahmed et al. (2022). However, the comprehensive policies outlined by the 2015 Paris Agreement have ushered nations towards a shared objective: to curtail the escalation of global temperature by maintaining a rise of less than 1.5°C.", style={'color': '#555', 'margin-bottom': '0.12in', 'padding': '10px'}),
+          html.P([
+            "Achieving this crucial aim demands a significant reduction in the volume of greenhouse gas emissions produced by each country. Therefore, in the aftermath of 2015, we should anticipate witnessing a discernible shift among certain nations, marked by a substantial decrease in their emissions output. A desirable outcome would involve a greater number of countries achieving negative growth in their GHG emissions, as opposed to those registering a positive trajectory, or countries with negative growth should have a greater magnitude than those who have positive growth.",
+            html.Span(" This would be a testament to the collective efforts aimed at mitigating the surge in global temperatures, aligning with the ultimate goal of the Paris Agreement.", style={'color': '#fd9372', 'font-weight': 'bold'}),
+            " To see that, we take at the top 5 largest and top 5 lowest percent changes in total GHG emissions using 2015 as a base year and 2021 as the latest year."
+        ], style={'color': '#555', 'margin-bottom': '0.12in', 'justify-content': 'center', 'padding': '15px'}),
+
+           html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("Diverging Bar Chart", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+
+        # Window, gas and metric of the diverging bar chart
+        dbc.Row(
+            children=[
+                dbc.Col(dcc.Dropdown(id='diverging-base-year', options=data.years, value=DIVERGING_DEFAULTS['base_year'], clearable=False, style={'color': 'black'}), width=2),
+                dbc.Col(dcc.Dropdown(id='diverging-target-year', options=data.years, value=DIVERGING_DEFAULTS['target_year'], clearable=False, style={'color': 'black'}), width=2),
+                dbc.Col(dcc.Dropdown(id='diverging-gas', options=[{'label': label, 'value': gas} for gas, label in GASES.items()], value=DIVERGING_DEFAULTS['gas'], clearable=False, style={'color': 'black'}), width=3),
+                dbc.Col(dcc.RadioItems(id='diverging-metric', options=[{'label': label, 'value': metric} for metric, (label, _) in METRICS.items()], value=DIVERGING_DEFAULTS['metric'], inline=True, inputStyle={'margin-right': '5px', 'margin-left': '15px'}, style={'color': '#555'}), width=5),
+            ],
+            style={'padding': '10px'},
+        ),
+
+        # Diverging Bar Chart for top 5 lowest and highest emitters
+        dcc.Graph(id='diverging-bar-chart', figure=diverging_bar_chart(data), style={"width": "100%", "display": "inline-block"}),
+    
+
+             html.H1(html.Span("Oh no!", style={'color': '#fd9372', 'font-weight': 'bold', 'justify-content': 'center', 'text-align': 'center', 'padding': '10px'}), style={'text-align': 'center'}),
+             html.P(["It seems that the top 5 locations with a positive growth in GHG emissions have a greater magnitude as compared to those that have a negative growth rate. What is even worse is that most of these nations are either developing countries, which normally do not emit a lot of GHG in the first place, or countries that normally don’t have an advanced urban area enough to generate significant amounts of GHG like the ",
+             html.Span("Cook Islands!", style={'color': '#fd9372', 'font-weight': 'bold'})], style={'color': '#555', 'margin-bottom': '0.5in', 'justify-content': 'center', 'padding': '15px'} ),
+
+             html.H1(html.Span("However!", style={'color': '#fd9372', 'font-weight': 'bold', 'justify-content': 'center', 'text-align': 'center', 'padding': '15px'}), style={'text-align': 'center'}),
+             html.P(["Taking a look at the diverging dataset ", 
+             html.Span("may not give out the whole truth", style={'color': '#fd9372', 'font-weight': 'bold'}), 
+               " of the situation. After all, it only provides the top 5 biggest rates of change in both the positive and negative directions. Thus, it is important to visualize the GHG emissions of the whole world throughout periods of time (especially in 2015-2021). Thus, the choropleth map below showcases just that. You may be able to look at the GHG emitted per country over time. Colors closer to yellow represent high total GHG emitted and colors closer to purple represent the opposite. Check out the visualization below."], style={'color': '#555', 'justify-content': 'center', 'padding': '15px'}),
+
+             html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("The Gas Giants: Choropleth Map", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+       # Choropleth Map and stacked bar chart from the updated code
+            dbc.Row(
+                children=[
+                    dbc.Col(
+                        children=[
+                            html.Div(
+                                dcc.Loading(
+                                    id="map-loading",
+                                    type="circle",
+                                    children=dcc.Graph(
+                                        id="choropleth-map",
+                                        # In client mode the geometry ships once, with the map for the latest year
+                                        figure=update_choropleth_map(data, data.years[-1]) if YEAR_SWITCH == "client" else None,
+                                        style={"width": "100%", "display": "inline-block"},
+                                    ),
+                                ),
+                                style={
+                                    "width": "100%",
+                                    "display": "flex",
+                                    "justify-content": "center",
+                                },
+                            )
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        children=[
+                            # Stacked Bar Chart for selected country from the updated code
+                            dcc.Loading(
+                                id="bar-loading",
+                                type="circle",
+                                children=dcc.Graph(
+                                    id="stacked-bar-chart",
+                                    style={"width": "50%", "display": "inline-block"},
+                                ),
+                            )
+                        ],
+                        width=4,
+                    ),
+                ]
+            ),
+    
+        # Per-year values for the client-side year switch
+        dcc.Store(id='year-values', data=data.year_values if YEAR_SWITCH == "client" else None),
+
+        # Slider for selecting the year from the updated code
+        dcc.Slider(
+            id='year-slider',
+            min=data.years[0],
+            max=data.years[-1],
+            value=data.years[-1],
+            tooltip={"placement": "bottom", "always_visible": True},
+            marks=None,
+            step=1
+        ),
+
+        html.P("You may try clicking on a country from the choropleth map to showcase its decomposition of Green House Gasses in a stacked bar chart below", style={'color': '#fd9372', 'font-weight': 'bold', 'padding': '15px'}),
+        html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("The Carbon Cartel: Methane, Carbon Dioxide, and Nitrous Oxide", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+        html.P(["Compared to the line chart, the Choropleth map actually gives a clearer output of which countries are emitting how much GHG. Take note that this is total GHG. This is important because we want to see other countries, ",
+               html.Span("especially developed ones", style={'color': '#fd9372', 'font-weight': 'bold'}),
+               " because they have a considerable impact on a global scale."], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+        html.P("Based on the choropleth map, three obvious generalizations can be made: Developed and bigger countries like the USA and Brazil are one of the biggest contributors of GHG (1). Countries that emit the least amount of GHG are usually developing countries (2). The biggest contributor to GHG is China which is not surprising given its heavily industrial economy (3).", style={'color': '#555', 'margin-bottom': '0.5in',  'padding': '15px'}),
+        html.P(["It is evident, that as the choropleth map changes over the years, GHG emitted, especially for developed countries, ",
+               html.Span("gets larger and larger.", style={'color': '#fd9372', 'font-weight': 'bold'})], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+        html.P("That is quite concerning, but let's explore the situation further by visualizing the gas decomposition through a stacked bar chart. Various industries and specific circumstances within a country can influence the composition of the greenhouse gases they emit. Hence, understanding this decomposition can be instrumental in making informed policy decisions to effectively reduce their overall greenhouse gas emissions. ", style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+    
+
+   
+
+        html.P("Some countries have different compositions than others. One emits more methane, the other emits more carbon dioxide. It is important to know this because these gasses are emitted by various kinds of factors. Knowing those factors, countries can use them to create policies to efficiently reduce overall GHG emissions.", style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+        html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("Were the Paris Agreement goals achieved?", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+        html.P(["The ultimate end goal of the Paris Agreement was to reduce rising global temperatures under 1.5C. To do that, considerable amounts of effort are placed into reducing GHG emissions. Some countries have already contributed to this, others have yet to kickstart their programs, and others show no signs of reducing their emissions anytime soon. ",
+               html.Span("So it is hard to say even with this visualization. However, at the current level and data, it seems that progress is slow.", style={'color': '#fd9372', 'font-weight': 'bold'})], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+
+        html.Div(style={'font-family': 'Nirmala UI, Proxima Nova, sans-serif', 'color': '#FFDEAD', 'background-color': '#cfe0e7', 'justify-content': 'center', 'text-align': 'justify',}, children=[
+        html.H1("Conclusion", style={'color': '#555', 'margin-bottom': '0.12in', 'text-align': 'center', 'padding': '10px'}),]),
+        html.P("Given such a time frame from 2015 to 2021, it cannot be said for certain that the Paris Agreement goals were achieved. Evidence from the visualizations shows that the majority of the countries continue to have rising emissions per year. We can only hope that this trend does not continue in the future.", style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+        html.P([
+            "Regardless of this, it is too early to say that the Paris Agreement goals were not reached. Policies ",
+            html.Span("take a lot of time to implement, and results are usually delayed or lagged in time.",
+                      style={'color': '#fd9372', 'font-weight': 'bold'}),
+            " This visualization, however, can just give ",
+            html.Span("a clear overview of the current situation with regard to it.",
+                      style={'color': '#fd9372', 'font-weight': 'bold'}),
+            " In the end, it is up to the policymakers and world leaders to decide to accelerate the reduction of GHG emission initiatives in the future."
+        ], style={'color': '#555', 'margin-bottom': '0.5in', 'padding': '15px'}),
+
+        ])
+
+# Diagnostics endpoints (/_metrics, /_profile, /_figure-cache) only answer requests from this
+# host, e.g. a node-local Prometheus agent; GHG_METRICS_PUBLIC=1 opens them to any client
+METRICS_PUBLIC = os.environ.get("GHG_METRICS_PUBLIC") == "1"
+
+def local_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not METRICS_PUBLIC and not ipaddress.ip_address(flask.request.remote_addr or "0.0.0.0").is_loopback:
+            flask.abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
+def register_callbacks(app, data):
+    # Callback to update the stacked bar chart based on the selected country from the choropleth map
+    @app.callback(
+        Output('stacked-bar-chart', 'figure'),
+        Input('choropleth-map', 'clickData')
+    )
+    @instrument_callback("update_stacked_bar_chart")
+    def stacked_bar_chart_callback(click_data):
+        return update_stacked_bar_chart(data, click_data)
+
+    # Callback to recompute the diverging bar chart for the window picked by the user
+    @app.callback(
+        Output('diverging-bar-chart', 'figure'),
+        Input('diverging-base-year', 'value'),
+        Input('diverging-target-year', 'value'),
+        Input('diverging-gas', 'value'),
+        Input('diverging-metric', 'value'),
+        prevent_initial_call=True,
+    )
+    @instrument_callback("update_diverging_bar_chart")
+    def diverging_bar_chart_callback(base_year, target_year, gas, metric):
+        return update_diverging_bar_chart(data, base_year, target_year, gas, metric)
+
+    # Callback to update the choropleth map based on the selected year from the updated code
+    if YEAR_SWITCH == "client":
+        app.clientside_callback(
+            ClientsideFunction(namespace='choropleth', function_name='set_year'),
+            Output('choropleth-map', 'figure'),
+            Input('year-slider', 'value'),
+            State('choropleth-map', 'figure'),
+            State('year-values', 'data'),
+            prevent_initial_call=True,
+        )
+    else:
+        # The browser fetches the cached JSON text from /_figure/choropleth/<year>, so a
+        # cache hit is sent without encoding the figure again
+        app.clientside_callback(
+            ClientsideFunction(namespace='choropleth', function_name='fetch_year'),
+            Output('choropleth-map', 'figure'),
+            Input('year-slider', 'value'),
+        )
+
+    choropleth_text = instrument_callback("update_choropleth_map")(lambda year: choropleth_json(data, year))
+
+    @app.server.route('/_figure/choropleth/<int:year>')
+    def choropleth_figure(year):
+        if year not in data.years:
+            return {"error": f"no data for {year}"}, 404
+        return choropleth_text(year), 200, {"Content-Type": "application/json"}
+
+    @app.callback(
+        Output('line-chart', 'figure'),
+        [Input('country-dropdown', 'value')]
+    )
+    @instrument_callback("update_line_chart")
+    def line_chart_callback(selected_countries):
+        return update_line_chart(data, selected_countries)
+
+    # Hit/miss counters of the figure cache, to check its effect under load
+    @app.server.route('/_figure-cache')
+    @local_only
+    def figure_cache_stats():
+        return figure_cache(data).stats()
+
+    # Country lookup by name/code (?q=) or by point (?lat=&lon=)
+    @app.server.route('/_country')
+    def country_lookup():
+        args = flask.request.args
+        countries = data.country_index
+        if "lat" in args and "lon" in args:
+            try:
+                lat, lon = float(args["lat"]), float(args["lon"])
+            except ValueError:
+                return {"error": "lat and lon must be numbers"}, 400
+            country = countries.locate(lat, lon)
+        else:
+            country = countries.lookup(args.get("q"))
+        if country is None:
+            return {"error": "no matching country"}, 404
+        return countries.describe(country)
+
+    # Startup spans, callback histograms and payload sizes in the Prometheus text format.
+    # The figure cache is only reported once something has used it.
+    metrics.gauges["ghg_figure_cache"] = lambda: figure_cache(data).stats() if "figure_cache" in data.product_names() else {}
+
+    @app.server.route('/_metrics')
+    @local_only
+    def metrics_endpoint():
+        return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+    # Optional sampling profiler (GHG_PROFILE=1), served as collapsed stacks for flame graphs
+    if os.environ.get("GHG_PROFILE") == "1":
+        profiler = SamplingProfiler(float(os.environ.get("GHG_PROFILE_INTERVAL", 0.01))).start()
+
+        @app.server.route('/_profile')
+        @local_only
+        def profile_endpoint():
+            return profiler.collapsed(), 200, {"Content-Type": "text/plain"}
+
+
+def create_app(data=None, prefetch=None):
+    """Build the Dash app without loading any data.
+
+    With prefetch (or GHG_PREFETCH=1) the datasets and figures are computed in a
+    background thread while the server is already listening; otherwise the first
+    request that needs them computes them.
+    """
+    data = data or GHGData()
+
+    # Workers started by gunicorn.conf.py map the dataset the master exported instead of loading their own
+    shared = os.environ.get("GHG_SHARED_DATASET")
+    if shared and os.path.exists(shared):
+        attach(data, shared)
+
+    if prefetch is None:
+        prefetch = os.environ.get("GHG_PREFETCH") == "1"
+
+    # Set your Mapbox access token here
+    px.set_mapbox_access_token(open(".mapbox_token").read())
+
+    # Initialize Dash application
+    with span("create_app"):
+        app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+        app.layout = lambda: serve_layout(data)
+        register_callbacks(app, data)
+
+    # Optionally build the map for every year up front (GHG_WARM_FIGURES=1)
+    warm = os.environ.get("GHG_WARM_FIGURES") == "1"
+    if prefetch:
+        steps = [lambda: serve_layout(data)]
+        if warm:
+            steps.append(lambda: warm_figure_cache(data))
+        data.prefetch(*steps)
+    elif warm:
+        warm_figure_cache(data)
+
+    # Ingest new emission rows dropped into GHG_INGEST_DIR while the app is running
+    inbox = os.environ.get("GHG_INGEST_DIR")
+    if inbox:
+        watch_inbox(data, inbox)
+    return app
+
+
+# WSGI entry point for gunicorn (see gunicorn.conf.py)
+def create_server():
+    return create_app().server
+
+
+# Run the app
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    app = create_app(prefetch=os.environ.get("GHG_PREFETCH", "1") == "1")
+    app.run(debug=True)
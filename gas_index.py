@@ -0,0 +1,58 @@
+import numpy as np
+
+# Gas columns of the 'Panel Total ghg' sheet, in the order they are stacked
+GAS_COLUMNS = [
+    "Annual CO2 emissions",
+    "Annual nitrous oxide emissions in CO2 equivalents",
+    "Annual methane emissions in CO2 equivalents",
+]
+
+
+class GasBreakdownIndex:
+    """Per-country Year x gas blocks of the panel, sorted by ADMIN.
+
+    Every country's rows sit next to each other in one contiguous array, so a
+    lookup is a dict hit plus a slice (a view, no copy).
+    """
+
+    def __init__(self, df, gas_columns=GAS_COLUMNS, key="ADMIN"):
+        self.gas_columns = list(gas_columns)
+        df = df.sort_values([key, "Year"], kind="mergesort")
+        self.years = df["Year"].to_numpy(dtype=np.int64)
+        self.values = np.ascontiguousarray(df[self.gas_columns].to_numpy(dtype=np.float64))
+
+        keys = df[key].to_numpy()
+        # Start of each run of equal keys; the sort makes every country a single run
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+        stops = np.r_[starts[1:], len(keys)]
+        self._slices = {keys[start]: slice(start, stop) for start, stop in zip(starts, stops)}
+
+    def __contains__(self, country):
+        return country in self._slices
+
+    def countries(self):
+        return list(self._slices)
+
+    def lookup(self, country):
+        """Return (years, values) for one country; values has one column per gas."""
+        block = self._slices.get(country)
+        if block is None:
+            return self.years[:0], self.values[:0]
+        return self.years[block], self.values[block]
+
+    @classmethod
+    def from_arrays(cls, years, values, countries, starts, stops, gas_columns=GAS_COLUMNS):
+        # Rebuild the index around existing arrays (e.g. views of a shared memory region)
+        index = cls.__new__(cls)
+        index.gas_columns = list(gas_columns)
+        index.years = years
+        index.values = values
+        index._slices = {country: slice(int(start), int(stop)) for country, start, stop in zip(countries, starts, stops)}
+        return index
+
+    def bounds(self):
+        """Return (countries, starts, stops) describing the per-country blocks."""
+        countries = list(self._slices)
+        starts = np.array([self._slices[c].start for c in countries], dtype=np.int64)
+        stops = np.array([self._slices[c].stop for c in countries], dtype=np.int64)
+        return countries, starts, stops
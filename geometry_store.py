@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+
+import numpy as np
+import shapely
+
+from data_cache import CACHE_DIR
+from instrumentation import log
+
+# Level of detail -> (simplify tolerance in degrees, decimals kept in coordinates).
+# The 1:10m Natural Earth polygons are far more detailed than a world map can show,
+# so even "high" drops most of the vertices.
+LEVELS = {
+    "low": (0.1, 2),
+    "medium": (0.03, 3),
+    "high": (0.005, 4),
+}
+
+GEOMETRY_DIR = os.path.join(CACHE_DIR, "geometry")
+
+# Bump when simplify_level changes, so stores (and shared datasets) built by older code are not reused
+STORE_VERSION = 3
+
+# (level, digest) -> geojson dict, so each level is read from disk once per process
+_loaded = {}
+
+
+def detail_for_zoom(zoom):
+    # Pick the coarsest level that still looks right at the given mapbox zoom
+    if zoom is None or zoom < 2.5:
+        return "low"
+    if zoom < 5:
+        return "medium"
+    return "high"
+
+
+def geometry_digest(gdf):
+    h = hashlib.sha1(f"v{STORE_VERSION}".encode())
+    h.update("\0".join(gdf["ADM0_A3"].astype(str)).encode())
+    for wkb in shapely.to_wkb(gdf.geometry.values):
+        h.update(wkb)
+    return h.hexdigest()[:16]
+
+
+def _round_coords(coords, decimals):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, decimals) for c in coords]
+    return [_round_coords(c, decimals) for c in coords]
+
+
+def simplify_coverage(geoms, tolerance):
+    """Simplify the country polygons so that borders shared by two countries stay shared.
+
+    coverage_simplify (GEOS >= 3.12) simplifies each shared edge once, so neighbours get
+    no gaps or overlaps. Polygons with invalid coverage edges (overlapping or slightly
+    misaligned neighbours) and older GEOS builds fall back to per-polygon simplification.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    out = shapely.simplify(geoms, tolerance, preserve_topology=True)
+    if not hasattr(shapely, "coverage_simplify"):
+        return out
+
+    present = np.flatnonzero(~shapely.is_missing(geoms) & ~shapely.is_empty(geoms))
+    valid = present[shapely.is_empty(shapely.coverage_invalid_edges(geoms[present]))]
+    if len(valid):
+        out[valid] = shapely.coverage_simplify(geoms[valid], tolerance)
+    if len(valid) < len(present):
+        log.info("Simplified %d of %d countries per polygon (invalid coverage edges)", len(present) - len(valid), len(present))
+    return out
+
+
+def simplify_level(gdf, level):
+    """Return a FeatureCollection of the countries at one level of detail, keyed by ADM0_A3."""
+    tolerance, decimals = LEVELS[level]
+    simplified = simplify_coverage(gdf.geometry.values, tolerance)
+    # Snap to the coordinate grid so neighbouring vertices collapse instead of piling up
+    snapped = shapely.set_precision(simplified, 10 ** -decimals)
+    # Atolls narrower than the grid (Tuvalu, Maldives, ...) snap to nothing; they keep their
+    # simplified shape at the finest precision so they stay on the map and clickable
+    collapsed = shapely.is_empty(snapped) & ~shapely.is_missing(simplified) & ~shapely.is_empty(simplified)
+    finest = max(d for _, d in LEVELS.values())
+
+    features = []
+    dropped = []
+    for code, geom, fallback, keep in zip(gdf["ADM0_A3"], snapped, simplified, collapsed):
+        places = decimals
+        if keep:
+            geom, places = fallback, finest
+        if geom is None or geom.is_empty:
+            dropped.append(code)
+            continue
+        shape = geom.__geo_interface__
+        features.append({
+            "type": "Feature",
+            "id": code,
+            "properties": {},
+            "geometry": {"type": shape["type"], "coordinates": _round_coords(shape["coordinates"], places)},
+        })
+    if dropped:
+        log.warning("Dropped %d countries without geometry from the %r level: %s", len(dropped), level, ", ".join(map(str, dropped)))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def store_path(level, digest):
+    return os.path.join(GEOMETRY_DIR, f"countries-{level}-{digest}.json.gz")
+
+
+def build_store(gdf, digest=None):
+    """Write every level of detail to the on-disk store and return their paths."""
+    digest = digest or geometry_digest(gdf)
+    os.makedirs(GEOMETRY_DIR, exist_ok=True)
+    paths = {}
+    for level in LEVELS:
+        target = store_path(level, digest)
+        if not os.path.exists(target):
+            data = json.dumps(simplify_level(gdf, level), separators=(",", ":")).encode()
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp, target)
+        paths[level] = target
+    return paths
+
+
+def read_geojson_bytes(level, digest):
+    with gzip.open(store_path(level, digest), "rb") as f:
+        return f.read()
+
+
+def load_geojson(gdf, level="low", digest=None):
+    """Return the simplified geojson for one level, building the store on first use."""
+    digest = digest or geometry_digest(gdf)
+    key = (level, digest)
+    if key not in _loaded:
+        if not os.path.exists(store_path(level, digest)):
+            build_store(gdf, digest)
+        _loaded[key] = json.loads(read_geojson_bytes(level, digest))
+    return _loaded[key]
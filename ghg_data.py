@@ -0,0 +1,191 @@
+import base64
+import functools
+import json
+import threading
+
+import numpy as np
+import shapely.geometry
+
+from analytics import EmissionsAnalytics
+from country_index import COUNTRY_ATTRIBUTES, CountryIndex
+from data_cache import workbook_digest
+from gas_index import GasBreakdownIndex
+from instrumentation import log, span
+from geometry_store import geometry_digest, load_geojson
+from loader import COUNTRIES_PATH, WORKBOOK_PATH, StartupLoader
+from trend_aggregation import TrendMatrix
+
+# Source -> the product read from it (see loader.py)
+SOURCE_PRODUCTS = {"panel": "df_GHG_per_gas", "countries": "zaworld"}
+
+
+def lazy(build):
+    # A data product: computed on first access, then memoized on the instance
+    name = build.__name__
+
+    @functools.wraps(build)
+    def getter(self):
+        return self.memo(name, lambda: build(self))
+
+    return property(getter)
+
+
+class GHGData:
+    """The datasets behind the dashboard, each computed on first use.
+
+    Products are memoized under one re-entrant lock, so a background prefetch
+    and a request thread never build the same product twice.
+    """
+
+    def __init__(self, workbook_path=WORKBOOK_PATH, countries_path=COUNTRIES_PATH):
+        self.workbook_path = workbook_path
+        self.countries_path = countries_path
+        self._products = {}
+        self._lock = threading.RLock()
+
+    def memo(self, name, build):
+        try:
+            return self._products[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._products:
+                # Every product build is a startup span, see instrumentation.py
+                with span(name):
+                    self._products[name] = build()
+            return self._products[name]
+
+    def product_names(self):
+        return list(self._products)
+
+    def swap(self, products, keep=()):
+        """Atomically replace the products with a new snapshot.
+
+        Products listed in keep are carried over, everything else is dropped and
+        rebuilt lazily from the new snapshot. Readers never take the lock, so
+        callbacks in flight finish on the products they already hold.
+        """
+        with self._lock:
+            snapshot = {name: self._products[name] for name in keep if name in self._products}
+            snapshot.update(products)
+            self._products = snapshot
+
+    def prefetch(self, *builders):
+        """Compute products in a daemon thread; each builder is a product name or a callable."""
+        def run():
+            for builder in builders:
+                if callable(builder):
+                    builder()
+                else:
+                    getattr(self, builder)
+            log.info("Succesfully prefetched data")
+
+        thread = threading.Thread(target=run, name="ghg-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    # Start reading every source that is still missing, all at once (see loader.py).
+    # Attached workers serve the map from the shared GeoJSON and never read the shapefile.
+    @lazy
+    def sources(self):
+        missing = [source for source, product in SOURCE_PRODUCTS.items() if product not in self._products]
+        if "geojson_bytes" in self._products:
+            missing.remove("countries")
+        return StartupLoader(self.workbook_path, self.countries_path, missing)
+
+    # Load the data and perform necessary operations (cached as Arrow after the first run)
+    @lazy
+    def df_GHG_per_gas(self):
+        return self.sources.result('panel')
+
+    @lazy
+    def workbook_key(self):
+        return workbook_digest(self.workbook_path)
+
+    @lazy
+    def years(self):
+        return sorted(int(year) for year in self.df_GHG_per_gas['Year'].unique())
+
+    # Replace 'Entity' with 'ADMIN' in the GHGtrend DataFrame
+    @lazy
+    def GHGtrend(self):
+        return self.df_GHG_per_gas.groupby(['Year', 'ADMIN'])['Total GHG emitted'].sum().reset_index()
+
+    # Gas x country x year cube for the diverging chart's change metrics
+    @lazy
+    def analytics(self):
+        return EmissionsAnalytics(self.df_GHG_per_gas)
+
+    # Dense country x year matrix of GHGtrend for the multi-select line chart
+    @lazy
+    def trend_matrix(self):
+        return TrendMatrix(self.GHGtrend)
+
+    # Per-country Year x gas blocks for the stacked bar chart
+    @lazy
+    def gas_breakdown(self):
+        return GasBreakdownIndex(self.df_GHG_per_gas)
+
+    # Reshape the panel data to a tidy format
+    @lazy
+    def df_GHG_per_gas_tidy(self):
+        return self.df_GHG_per_gas.pivot_table(index='ADM0_A3', columns='Year', values='Total GHG emitted').reset_index()
+
+    # Load geospatial data
+    @lazy
+    def zaworld(self):
+        return self.sources.result('countries')
+
+    # Merge GHG data with geospatial data
+    @lazy
+    def merged_df(self):
+        return self.zaworld.merge(self.df_GHG_per_gas_tidy, on='ADM0_A3', how='left')
+
+    # ADM0_A3 -> UN region, for the regional rollup of the trend chart
+    @lazy
+    def regions(self):
+        return dict(zip(self.zaworld['ADM0_A3'], self.zaworld['REGION_UN']))
+
+    # Natural Earth attributes and ids of the country identity index (see country_index.py)
+    @lazy
+    def country_attributes(self):
+        return self.zaworld[[c for c in COUNTRY_ATTRIBUTES if c in self.zaworld.columns]].copy()
+
+    @lazy
+    def country_index(self):
+        attributes = self.country_attributes
+        shared = self._products.get("geojson_bytes")
+        if shared and "zaworld" not in self._products:
+            # Attached workers never load the full geometries; the finest stored level is plenty for lookups
+            features = json.loads(bytes(shared["high"]))["features"]
+            shapes = {f["id"]: shapely.geometry.shape(f["geometry"]) for f in features}
+            geometries = [shapes.get(code) for code in attributes["ADM0_A3"]]
+        else:
+            geometries = self.zaworld.geometry.values
+        return CountryIndex(attributes, geometries, self.df_GHG_per_gas)
+
+    @lazy
+    def geometry_key(self):
+        return geometry_digest(self.zaworld)
+
+    # Simplified GeoJSON at one level of detail (see geometry_store.py), read from the
+    # shared dataset when one is attached (see shared_dataset.py)
+    def geojson(self, level):
+        def build():
+            shared = self._products.get("geojson_bytes", {})
+            if level in shared:
+                return json.loads(bytes(shared[level]))
+            return load_geojson(self.zaworld, level, self.geometry_key)
+        return self.memo(f"geojson-{level}", build)
+
+    # Country x year matrix of total GHG for the client-side year switch, as a base64 float32 array.
+    # Rows are years so each slider position reads one contiguous slice.
+    @lazy
+    def year_values(self):
+        years = [int(c) for c in self.df_GHG_per_gas_tidy.columns if c != 'ADM0_A3']
+        values = np.ascontiguousarray(self.merged_df[years].to_numpy(dtype='<f4').T)
+        return {
+            "years": years,
+            "locations": self.merged_df['ADM0_A3'].tolist(),
+            "values": base64.b64encode(values.tobytes()).decode('ascii'),
+        }
@@ -0,0 +1,20 @@
+# gunicorn -c gunicorn.conf.py
+#
+# The master loads the data once and writes it to a read-only shared memory region
+# (see shared_dataset.py); every worker maps that region instead of holding its own copy.
+import logging
+import os
+
+wsgi_app = "final:create_server()"
+workers = int(os.environ.get("GHG_WORKERS", 4))
+
+
+# Startup spans and ingest messages of the "ghg" logger (see instrumentation.py)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(name)s %(message)s")
+
+
+def on_starting(server):
+    from ghg_data import GHGData
+    from shared_dataset import export
+
+    os.environ["GHG_SHARED_DATASET"] = export(GHGData())
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+
+from gas_index import GAS_COLUMNS
+from instrumentation import log
+
+VALUE = "Total GHG emitted"
+
+# Short names accepted in ingested files for the gas columns of the panel
+GAS_ALIASES = {
+    "CO2": "Annual CO2 emissions",
+    "N2O": "Annual nitrous oxide emissions in CO2 equivalents",
+    "CH4": "Annual methane emissions in CO2 equivalents",
+}
+
+# Products that only depend on the geometry and survive an ingest
+GEOMETRY_PRODUCTS = ("zaworld", "geometry_key", "regions", "country_attributes", "geojson_bytes", "shared_region")
+
+
+def read_rows(path):
+    """Read new (ADM0_A3, Year, gas columns) rows from a CSV or Parquet file."""
+    if path.endswith(".parquet"):
+        rows = pd.read_parquet(path)
+    else:
+        rows = pd.read_csv(path)
+    rows = rows.rename(columns=GAS_ALIASES)
+
+    missing = [c for c in ["ADM0_A3", "Year", *GAS_COLUMNS] if c not in rows.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+
+    rows["Year"] = rows["Year"].astype(int)
+    if VALUE not in rows.columns:
+        rows[VALUE] = rows[GAS_COLUMNS].sum(axis=1)
+    return rows
+
+
+def _upsert_panel(panel, rows):
+    # Fill in ADMIN from the rows we already have for the same code
+    names = panel.drop_duplicates("ADM0_A3").set_index("ADM0_A3")["ADMIN"]
+    rows = rows.copy()
+    if "ADMIN" in rows.columns:
+        rows["ADMIN"] = rows["ADMIN"].fillna(rows["ADM0_A3"].map(names))
+    else:
+        rows["ADMIN"] = rows["ADM0_A3"].map(names)
+    rows["ADMIN"] = rows["ADMIN"].fillna(rows["ADM0_A3"])
+
+    # New rows replace existing (ADM0_A3, Year) rows; within the file the last row for a key wins
+    rows = rows.drop_duplicates(["ADM0_A3", "Year"], keep="last")
+    keys = pd.MultiIndex.from_frame(rows[["ADM0_A3", "Year"]])
+    kept = panel[~pd.MultiIndex.from_frame(panel[["ADM0_A3", "Year"]]).isin(keys)]
+    rows = rows.reindex(columns=panel.columns.union(rows.columns, sort=False))
+    return pd.concat([kept, rows[kept.columns]], ignore_index=True), rows
+
+
+def _update_trend(trend, panel, rows):
+    # Re-aggregate only the (Year, ADMIN) groups that received rows
+    touched = pd.MultiIndex.from_frame(rows[["Year", "ADMIN"]].drop_duplicates())
+    in_touched = pd.MultiIndex.from_frame(panel[["Year", "ADMIN"]]).isin(touched)
+    fresh = panel[in_touched].groupby(["Year", "ADMIN"])[VALUE].sum().reset_index()
+    kept = trend[~pd.MultiIndex.from_frame(trend[["Year", "ADMIN"]]).isin(touched)]
+    return pd.concat([kept, fresh], ignore_index=True).sort_values(["Year", "ADMIN"], ignore_index=True)
+
+
+def _update_tidy(tidy, panel, rows):
+    # New values win; new years become new columns
+    codes = rows["ADM0_A3"].unique()
+    fresh = panel[panel["ADM0_A3"].isin(codes)].pivot_table(index="ADM0_A3", columns="Year", values=VALUE)
+    wide = fresh.combine_first(tidy.set_index("ADM0_A3"))
+    wide = wide[sorted(wide.columns)]
+    wide.columns.name = "Year"
+    return wide.reset_index(), fresh
+
+
+def _update_merged(merged, tidy, fresh):
+    merged = merged.copy(deep=False)
+    values = tidy.set_index("ADM0_A3")
+    for year in fresh.columns:
+        merged[year] = merged["ADM0_A3"].map(values[year])
+    return merged
+
+
+def ingest(data, rows):
+    """Apply new rows to a GHGData's products and swap them in atomically.
+
+    The new products are built on the side, so callbacks already running keep
+    reading the previous snapshot; products derived from these are rebuilt lazily.
+    """
+    panel, rows = _upsert_panel(data.df_GHG_per_gas, rows)
+    trend = _update_trend(data.GHGtrend, panel, rows)
+    tidy, fresh = _update_tidy(data.df_GHG_per_gas_tidy, panel, rows)
+    merged = _update_merged(data.merged_df, tidy, fresh)
+
+    # Give the new snapshot its own version so the figure cache's disk tier is not reused
+    digest = hashlib.sha1(data.workbook_key.encode())
+    digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+
+    data.swap({
+        "df_GHG_per_gas": panel,
+        "GHGtrend": trend,
+        "df_GHG_per_gas_tidy": tidy,
+        "merged_df": merged,
+        "workbook_key": digest.hexdigest()[:16],
+    }, keep=[name for name in data.product_names() if name in GEOMETRY_PRODUCTS or name.startswith("geojson-")])
+    log.info("Succesfully ingested %d rows", len(rows))
+
+
+def ingest_file(data, path):
+    ingest(data, read_rows(path))
+
+
+def watch_inbox(data, directory, interval=5.0):
+    """Ingest every new or modified CSV/Parquet file dropped into directory, from a daemon thread."""
+    seen = {}
+
+    def run():
+        while True:
+            try:
+                entries = sorted(os.scandir(directory), key=lambda e: e.stat().st_mtime)
+            except OSError as e:
+                log.warning("Could not scan %s: %s", directory, e)
+                entries = []
+            for entry in entries:
+                if not entry.name.endswith((".csv", ".parquet")):
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                if seen.get(entry.path) == mtime:
+                    continue
+                seen[entry.path] = mtime
+                try:
+                    ingest_file(data, entry.path)
+                except Exception as e:  # a bad file must not stop the watcher
+                    log.warning("Could not ingest %s: %s", entry.path, e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="ghg-ingest", daemon=True)
+    thread.start()
+    return thread
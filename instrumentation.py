@@ -0,0 +1,177 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import plotly.utils
+
+log = logging.getLogger("ghg")
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class Metrics:
+    """Per-process registry of startup spans, callback histograms and payload counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}  # name -> (self seconds, total seconds, parent stage)
+        self.durations = {}
+        self.serialize = {}
+        self.payload_bytes = Counter()
+        self.gauges = {}  # name -> callable returning {label value: number}
+
+    def record_stage(self, name, own, total, parent=""):
+        with self._lock:
+            self.stages[name] = (own, total, parent)
+
+    def observe(self, table, name, seconds):
+        with self._lock:
+            table.setdefault(name, Histogram()).observe(seconds)
+
+    def add_payload(self, name, size):
+        with self._lock:
+            self.payload_bytes[name] += size
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            # Self time excludes nested stages, so the stages add up to the startup time
+            out = ["# TYPE ghg_startup_stage_seconds gauge"]
+            out += [f'ghg_startup_stage_seconds{{stage="{k}",parent="{p}"}} {own}' for k, (own, _, p) in self.stages.items()]
+            out.append("# TYPE ghg_startup_stage_total_seconds gauge")
+            out += [f'ghg_startup_stage_total_seconds{{stage="{k}",parent="{p}"}} {total}' for k, (_, total, p) in self.stages.items()]
+            out.append("# TYPE ghg_callback_duration_seconds histogram")
+            for name, h in self.durations.items():
+                out += h.lines("ghg_callback_duration_seconds", f'callback="{name}"')
+            out.append("# TYPE ghg_callback_serialize_seconds histogram")
+            for name, h in self.serialize.items():
+                out += h.lines("ghg_callback_serialize_seconds", f'callback="{name}"')
+            out.append("# TYPE ghg_callback_payload_bytes_total counter")
+            out += [f'ghg_callback_payload_bytes_total{{callback="{k}"}} {v}' for k, v in self.payload_bytes.items()]
+            gauges = list(self.gauges.items())
+        for name, read in gauges:
+            out.append(f"# TYPE {name} gauge")
+            out += [f'{name}{{key="{k}"}} {v}' for k, v in read().items()]
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+# Fraction of callback results that are also serialized to measure encoding time and payload size
+SERIALIZE_SAMPLE = float(os.environ.get("GHG_METRICS_SAMPLE", 0.1))
+
+
+# Stages open in the current thread, as [name, seconds spent in nested stages]
+_open_spans = threading.local()
+
+
+@contextmanager
+def span(name):
+    """Time one startup stage and log it.
+
+    Stages nest (a product built while building another); each records its self
+    time, without the nested stages, along with the name of its parent stage.
+    """
+    stack = _open_spans.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else None
+    frame = [name, 0.0]
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        if parent is not None:
+            parent[1] += seconds
+        own = seconds - frame[1]
+        metrics.record_stage(name, own, seconds, parent[0] if parent else "")
+        log.info("Succesfully built %s in %.1f ms (%.1f ms own)", name, seconds * 1000, own * 1000)
+
+
+def instrument_callback(name, sample=None):
+    """Record the duration of a Dash callback, and on a sample of calls its serialization cost."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            metrics.observe(metrics.durations, name, time.perf_counter() - start)
+
+            if random.random() < (SERIALIZE_SAMPLE if sample is None else sample):
+                start = time.perf_counter()
+                # Pre-encoded results (see figure_cache.py) are already the payload
+                text = result if isinstance(result, str) else json.dumps(result, cls=plotly.utils.PlotlyJSONEncoder)
+                metrics.observe(metrics.serialize, name, time.perf_counter() - start)
+                metrics.add_payload(name, len(text))
+            return result
+        return wrapper
+    return decorate
+
+
+class SamplingProfiler:
+    """Samples the stacks of every other thread at a fixed interval.
+
+    The counts are kept as collapsed stacks ("file:function;file:function N"),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ghg-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_filename}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def collapsed(self):
+        with self._lock:
+            return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common()) + "\n"
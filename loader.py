@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import geopandas as gpd
+
+from country_index import COUNTRY_ATTRIBUTES
+from data_cache import is_cached, read_sheet
+from gas_index import GAS_COLUMNS
+from instrumentation import log
+
+# Where the sources are read from, overridable per deployment. The repository only tracks
+# the shapefile's sidecar files, so the .shp itself has to be downloaded from Natural Earth
+# (1:10m Admin 0 - Countries) next to them, or GHG_COUNTRIES_PATH pointed at a copy.
+WORKBOOK_PATH = os.environ.get("GHG_WORKBOOK_PATH", "GHGperGas_Cleaned.xlsx")
+COUNTRIES_PATH = os.environ.get("GHG_COUNTRIES_PATH", "ne_10m_admin_0_countries.shp")
+NATURAL_EARTH_URL = "https://www.naturalearthdata.com/downloads/10m-cultural-vectors/10m-admin-0-countries/"
+
+# Processes reading the expensive sources at startup; 0 or 1 reads them one after the other in this process
+LOADER_WORKERS = int(os.environ.get("GHG_LOADER_WORKERS", "2"))
+
+PANEL_SHEET = "Panel Total ghg"
+
+# Only the columns the dashboard uses
+PANEL_COLUMNS = ["ADMIN", "ADM0_A3", "Year", *GAS_COLUMNS, "Total GHG emitted"]
+COUNTRY_COLUMNS = [*COUNTRY_ATTRIBUTES, "REGION_UN"]
+
+SOURCES = ("panel", "countries")
+
+
+def read_countries(path, columns=COUNTRY_COLUMNS):
+    if "://" not in path and not os.path.exists(path):
+        raise FileNotFoundError(
+            f"countries shapefile {path!r} not found; download it from {NATURAL_EARTH_URL} "
+            "or set GHG_COUNTRIES_PATH"
+        )
+    # The geometry column is always read
+    return gpd.read_file(path, columns=columns)
+
+
+class StartupLoader:
+    """Reads the workbook sheets and the countries shapefile concurrently.
+
+    The expensive reads (the shapefile, and sheets missing from the Arrow cache)
+    are submitted to a process pool as soon as the loader is made, so a cold
+    startup takes about as long as the slowest source. Cached sheets are only
+    memory mapped and are read in this process; with fewer than two expensive
+    reads no pool is started at all. Products wait only on the sources they
+    need; the geometry merge waits on both.
+    """
+
+    def __init__(self, workbook_path=WORKBOOK_PATH, countries_path=COUNTRIES_PATH, sources=SOURCES, workers=LOADER_WORKERS):
+        self._readers = {
+            "panel": (read_sheet, workbook_path, PANEL_SHEET, PANEL_COLUMNS),
+            "countries": (read_countries, countries_path),
+        }
+        self._futures = {}
+
+        expensive = [name for name in sources if not (name == "panel" and is_cached(workbook_path, PANEL_SHEET))]
+        workers = min(workers, len(expensive))
+        if workers > 1 and len(expensive) > 1:
+            # Spawned, not forked: the loader can be started from a prefetch or request thread,
+            # and forking a threaded process can leave the child stuck on a lock held by another thread
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            for name in expensive:
+                fn, *args = self._readers[name]
+                self._futures[name] = pool.submit(fn, *args)
+            # Submitted reads still run; the processes exit once they are done
+            pool.shutdown(wait=False)
+            log.info("Reading %s in %d processes", ", ".join(expensive), workers)
+
+        # Everything else (cached sheets, or all sources without a pool) is read here
+        for name in sources:
+            if name not in self._futures:
+                self._futures[name] = self._run(name)
+
+    def _run(self, name):
+        fn, *args = self._readers[name]
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def result(self, name):
+        # A source left out at startup is read here, in this process
+        if name not in self._futures:
+            self._futures[name] = self._run(name)
+        return self._futures[name].result()
+
+    def wait(self):
+        return {name: self.result(name) for name in list(self._futures)}
@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR
+from gas_index import GAS_COLUMNS, GasBreakdownIndex
+from geometry_store import LEVELS, build_store, read_geojson_bytes
+from instrumentation import log
+from trend_aggregation import TrendMatrix
+
+# Layout of the region: MAGIC, header length (uint64), JSON header, then the
+# arrays and blobs, each starting on an ALIGN byte boundary
+MAGIC = b"GHGSHM01"
+ALIGN = 64
+
+VALUE = "Total GHG emitted"
+PANEL_COLUMNS = ["Year", *GAS_COLUMNS, VALUE]
+
+# /dev/shm keeps the region in RAM on Linux; elsewhere the page cache does the sharing
+SHARED_DIR = os.environ.get("GHG_SHARED_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else CACHE_DIR)
+
+
+def shared_path(data):
+    return os.path.join(SHARED_DIR, f"ghg-{data.workbook_key}-{data.geometry_key}.bin")
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_region(path, arrays, blobs, meta):
+    """Write named numpy arrays and byte blobs into one file that can be mapped read-only."""
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    header = {"arrays": {}, "blobs": {}, "meta": meta}
+
+    # Offsets are relative to the start of the data section, which follows the header
+    offset = 0
+    for name, a in arrays.items():
+        header["arrays"][name] = {"offset": offset, "dtype": a.dtype.str, "shape": list(a.shape)}
+        offset = _align(offset + a.nbytes)
+    for name, b in blobs.items():
+        header["blobs"][name] = {"offset": offset, "length": len(b)}
+        offset = _align(offset + len(b))
+
+    encoded = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(encoded))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+        for name, a in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(a.tobytes())
+        for name, b in blobs.items():
+            f.seek(data_start + header["blobs"][name]["offset"])
+            f.write(b)
+    os.replace(tmp, path)
+
+
+class SharedRegion:
+    """A read-only memory mapping of a file written by write_region.
+
+    Arrays and blobs are views into the mapping, so every process that opens the
+    same file shares the same physical pages.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a shared GHG dataset")
+        (length,) = struct.unpack("<Q", self._map[len(MAGIC):len(MAGIC) + 8])
+        start = len(MAGIC) + 8
+        header = json.loads(self._map[start:start + length])
+        self._data_start = _align(start + length)
+        self._arrays = header["arrays"]
+        self._blobs = header["blobs"]
+        self.meta = header["meta"]
+
+    def array(self, name):
+        spec = self._arrays[name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+        a = np.frombuffer(self._map, dtype=dtype, count=count, offset=self._data_start + spec["offset"])
+        return a.reshape(spec["shape"])
+
+    def blob(self, name):
+        spec = self._blobs[name]
+        start = self._data_start + spec["offset"]
+        return memoryview(self._map)[start:start + spec["length"]]
+
+
+def _decode(labels, codes):
+    # pd.factorize codes missing values (the aggregates' blank ADM0_A3) as -1, which picks the trailing None
+    return np.asarray([*labels, None], dtype=object)[codes]
+
+
+def export(data, path=None):
+    """Write the shared dataset for a GHGData, e.g. from the gunicorn master before forking."""
+    path = path or shared_path(data)
+    if os.path.exists(path):
+        return path
+
+    panel = data.df_GHG_per_gas
+    admin_codes, admins = pd.factorize(panel["ADMIN"])
+    a3_codes, a3s = pd.factorize(panel["ADM0_A3"])
+
+    merged = data.merged_df
+    years = [int(c) for c in data.df_GHG_per_gas_tidy.columns if c != "ADM0_A3"]
+
+    gas = data.gas_breakdown
+    gas_countries, gas_starts, gas_stops = gas.bounds()
+    trend = data.trend_matrix
+
+    arrays = {f"panel/{c}": panel[c].to_numpy(dtype=np.int64 if c == "Year" else np.float64) for c in PANEL_COLUMNS}
+    arrays.update({
+        "panel/ADMIN": admin_codes.astype(np.int32),
+        "panel/ADM0_A3": a3_codes.astype(np.int32),
+        "merged/values": merged[years].to_numpy(dtype=np.float64),
+        "gas/years": gas.years,
+        "gas/values": gas.values,
+        "gas/starts": gas_starts,
+        "gas/stops": gas_stops,
+        "trend/years": trend.years,
+        "trend/matrix": trend.matrix,
+    })
+
+    build_store(data.zaworld, data.geometry_key)
+    blobs = {f"geojson/{level}": read_geojson_bytes(level, data.geometry_key) for level in LEVELS}
+    blobs["year_values"] = json.dumps(data.year_values).encode()
+
+    meta = {
+        "workbook_key": data.workbook_key,
+        "geometry_key": data.geometry_key,
+        "admins": [str(a) for a in admins],
+        "a3s": [str(a) for a in a3s],
+        "years": years,
+        "merged/ADM0_A3": merged["ADM0_A3"].astype(str).tolist(),
+        "merged/ADMIN": merged["ADMIN"].astype(str).tolist(),
+        "gas/countries": [str(c) for c in gas_countries],
+        "trend/names": [str(n) for n in trend.names()],
+        "regions": {str(k): v for k, v in data.regions.items()},
+        "countries": data.country_attributes.astype(object).where(data.country_attributes.notna(), None).to_dict(orient="list"),
+    }
+    write_region(path, arrays, blobs, meta)
+    log.info("Succesfully exported shared dataset to %s", path)
+    return path
+
+
+def attach(data, path):
+    """Swap the shared, read-only products of a region into a GHGData.
+
+    Numeric arrays stay views of the mapping; only the string columns and the
+    small metadata are materialised per process. The full 1:10m geometries are
+    never loaded: the map only needs the prebuilt GeoJSON bytes.
+    """
+    region = SharedRegion(path)
+    meta = region.meta
+
+    panel = pd.DataFrame({c: region.array(f"panel/{c}") for c in PANEL_COLUMNS}, copy=False)
+    panel.insert(0, "ADMIN", _decode(meta["admins"], region.array("panel/ADMIN")))
+    panel.insert(1, "ADM0_A3", _decode(meta["a3s"], region.array("panel/ADM0_A3")))
+
+    merged = pd.DataFrame(region.array("merged/values"), columns=meta["years"], copy=False)
+    merged.insert(0, "ADM0_A3", meta["merged/ADM0_A3"])
+    merged.insert(1, "ADMIN", meta["merged/ADMIN"])
+
+    gas = GasBreakdownIndex.from_arrays(
+        region.array("gas/years"), region.array("gas/values"),
+        meta["gas/countries"], region.array("gas/starts"), region.array("gas/stops"),
+    )
+    trend = TrendMatrix.from_arrays(region.array("trend/years"), region.array("trend/matrix"), meta["trend/names"])
+
+    data.swap({
+        "df_GHG_per_gas": panel,
+        "merged_df": merged,
+        "gas_breakdown": gas,
+        "trend_matrix": trend,
+        "year_values": json.loads(bytes(region.blob("year_values"))),
+        "geojson_bytes": {level: region.blob(f"geojson/{level}") for level in LEVELS},
+        "regions": meta["regions"],
+        "country_attributes": pd.DataFrame(meta["countries"]),
+        "workbook_key": meta["workbook_key"],
+        "geometry_key": meta["geometry_key"],
+        "shared_region": region,
+    })
+    log.info("Succesfully attached shared dataset %s", path)
+    return region
@@ -0,0 +1,242 @@
+"""Pre-render the whole dashboard into static files.
+
+    python static_export.py --out site --workers 8
+
+Every figure state the page can reach is rendered ahead of time, in parallel with
+a process pool, into JSON (plus a .gz sibling for gzip_static / CDN serving):
+
+    index.html                        the narrative and controls, rendered from serve_layout()
+    figures/choropleth.json           the map with its geometry, sent once
+    data/year-values.json             per-year values the slider swaps in (assets/choropleth.js)
+    figures/stacked/<ADM0_A3>.json    the gas breakdown of every clickable country
+    figures/line-chartall.json        the all-countries trend chart
+    data/trend.json                   the trend matrix the multi-select line chart is drawn from
+    figures/diverging/...             the diverging chart for every gas/metric/window ending in a target year
+
+static_site/dashboard.js wires the controls to those files, so the page can be
+served by any static file server with no Python on the request path.
+"""
+import argparse
+import gzip
+import html
+import json
+import multiprocessing
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import dash_bootstrap_components as dbc
+import plotly.utils
+
+import final
+from ghg_data import GHGData
+from instrumentation import log, span
+from shared_dataset import attach, export
+
+PLOTLY_JS = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The GHGData of each pool process, attached to the shared dataset written by the parent
+_data = None
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower())
+
+
+def write_json(out_dir, relative, obj):
+    path = os.path.join(out_dir, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    text = json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder, separators=(",", ":")).encode()
+    with open(path, "wb") as f:
+        f.write(text)
+    with gzip.open(path + ".gz", "wb", compresslevel=9) as f:
+        f.write(text)
+    return len(text)
+
+
+def _init_worker(shared_path):
+    global _data
+    _data = GHGData()
+    attach(_data, shared_path)
+
+
+def _render(batch):
+    out_dir, tasks = batch
+    written = 0
+    for kind, relative, args in tasks:
+        if kind == "stacked":
+            figure = final.update_stacked_bar_chart(_data, {"points": [{"location": args[0]}]})
+        elif kind == "diverging":
+            figure = final.update_diverging_bar_chart(_data, *args)
+        else:
+            raise ValueError(f"unknown figure kind {kind!r}")
+        written += write_json(out_dir, relative, figure)
+    return written
+
+
+def _batches(out_dir, tasks, size):
+    return [(out_dir, tasks[i:i + size]) for i in range(0, len(tasks), size)]
+
+
+# Dash component tree -> static HTML. Only the components the layout uses are covered;
+# graphs become empty containers that dashboard.js fills in.
+
+def _css_property(name):
+    # React style keys may be camelCase ('marginBottom'); the layout mostly uses CSS names already
+    return re.sub(r"([A-Z])", r"-\1", name).lower()
+
+
+def _style(style):
+    if not style:
+        return ""
+    css = "; ".join(f"{_css_property(k)}: {v}" for k, v in style.items())
+    return f' style="{html.escape(css)}"'
+
+
+def _attrs(props, classes=""):
+    out = ""
+    if props.get("id"):
+        out += f' id="{html.escape(str(props["id"]))}"'
+    classes = " ".join(c for c in (classes, props.get("className", "")) if c)
+    if classes:
+        out += f' class="{html.escape(classes)}"'
+    return out + _style(props.get("style"))
+
+
+def _options(options):
+    for option in options or []:
+        if isinstance(option, dict):
+            yield option["value"], option.get("label", option["value"])
+        else:
+            yield option, option
+
+
+def render_html(node):
+    if node is None:
+        return ""
+    if isinstance(node, (list, tuple)):
+        return "".join(render_html(child) for child in node)
+    if isinstance(node, (str, int, float)):
+        return html.escape(str(node))
+
+    spec = node.to_plotly_json()
+    kind, namespace, props = spec["type"], spec["namespace"], spec["props"]
+    children = render_html(props.get("children"))
+
+    if namespace == "dash_html_components":
+        tag = kind.lower()
+        return f"<{tag}{_attrs(props)}>{children}</{tag}>"
+    if namespace == "dash_bootstrap_components":
+        if kind == "Row":
+            return f'<div{_attrs(props, "row")}>{children}</div>'
+        if kind == "Col":
+            width = props.get("width")
+            return f'<div{_attrs(props, f"col-{width}" if width else "col")}>{children}</div>'
+    if kind == "Graph":
+        return f'<div{_attrs(props, "graph")}></div>'
+    if kind == "Loading":
+        return children
+    if kind == "Store":
+        return ""
+    if kind == "Slider":
+        return (
+            f'<input type="range"{_attrs(props)} min="{props["min"]}" max="{props["max"]}" '
+            f'step="{props.get("step", 1)}" value="{props.get("value", props["max"])}">'
+            f'<output for="{props["id"]}">{props.get("value", props["max"])}</output>'
+        )
+    if kind == "Dropdown":
+        selected = props.get("value")
+        selected = set(map(str, selected if isinstance(selected, list) else [selected]))
+        options = "".join(
+            f'<option value="{html.escape(str(v))}"{" selected" if str(v) in selected else ""}>{html.escape(str(label))}</option>'
+            for v, label in _options(props.get("options"))
+        )
+        multiple = " multiple" if props.get("multi") else ""
+        return f'<select{_attrs(props, "form-select")}{multiple}>{options}</select>'
+    if kind == "RadioItems":
+        name = html.escape(str(props["id"]))
+        items = "".join(
+            f'<label class="me-3"><input type="radio" name="{name}" value="{html.escape(str(v))}"'
+            f'{" checked" if v == props.get("value") else ""}> {html.escape(str(label))}</label>'
+            for v, label in _options(props.get("options"))
+        )
+        return f"<div{_attrs(props)}>{items}</div>"
+    raise ValueError(f"cannot render {namespace}.{kind} statically")
+
+
+def render_page(data):
+    body = render_html(final.serve_layout(data))
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Visualizing the Fight Against Climate Change</title>
+<link rel="stylesheet" href="{dbc.themes.BOOTSTRAP}">
+<script src="{PLOTLY_JS}"></script>
+<script>window.dash_clientside = {{no_update: null}};</script>
+<script src="assets/choropleth.js"></script>
+</head>
+<body>
+{body}
+<script src="assets/dashboard.js"></script>
+</body>
+</html>
+"""
+
+
+def build(out_dir, workers=None, diverging_targets=None, batch_size=25):
+    data = GHGData()
+    shared_path = export(data)
+
+    with span("static export"):
+        os.makedirs(os.path.join(out_dir, "assets"), exist_ok=True)
+        shutil.copy(os.path.join(HERE, "assets", "choropleth.js"), os.path.join(out_dir, "assets", "choropleth.js"))
+        shutil.copy(os.path.join(HERE, "static_site", "dashboard.js"), os.path.join(out_dir, "assets", "dashboard.js"))
+        with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write(render_page(data))
+
+        # Figures rendered once in this process
+        write_json(out_dir, "figures/choropleth.json", final.create_choropleth_map(data, data.years[-1]))
+        write_json(out_dir, "data/year-values.json", data.year_values)
+        write_json(out_dir, "figures/line-chartall.json", final.line_chart_all(data))
+        write_json(out_dir, "figures/diverging/default.json", final.diverging_bar_chart(data))
+        trend = data.trend_matrix
+        write_json(out_dir, "data/trend.json", {"names": trend.names(), "years": trend.years, "values": trend.matrix})
+
+        # Figures rendered by the pool
+        countries = data.country_index
+        in_panel = set(data.gas_breakdown.countries())
+        tasks = [
+            ("stacked", f"figures/stacked/{code}.json", (code,))
+            for code, name in zip(countries.codes, countries.panel_names) if name in in_panel
+        ]
+        targets = diverging_targets or sorted({2021, data.years[-1]})
+        tasks += [
+            ("diverging", f"figures/diverging/{metric}/{slug(gas)}/{base}-{target}.json", (base, target, gas, metric))
+            for target in targets for base in data.years if base < target
+            for gas in final.GASES for metric in final.METRICS
+        ]
+
+        # Spawned workers only map the shared dataset; nothing of this process (or its loader threads) is inherited
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=spawn, initializer=_init_worker, initargs=(shared_path,)) as pool:
+            written = sum(pool.map(_render, _batches(out_dir, tasks, batch_size)))
+    log.info("Succesfully rendered %d figure states (%.1f MB uncompressed) into %s", len(tasks) + 5, written / 1e6, out_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="site", help="output directory")
+    parser.add_argument("--workers", type=int, help="processes in the render pool (default: CPU count)")
+    parser.add_argument("--diverging-targets", type=int, nargs="*", help="target years pre-rendered for the diverging chart")
+    args = parser.parse_args(argv)
+    build(args.out, args.workers, args.diverging_targets)
+
+
+if __name__ == "__main__":
+    import logging
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    main()
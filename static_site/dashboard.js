@@ -0,0 +1,110 @@
+// Wires the statically exported page (static_export.py) to its pre-rendered figures.
+// Every figure is a JSON file next to index.html; nothing is computed on a server.
+(function() {
+    function getJSON(path) {
+        return fetch(path).then(function(response) {
+            if (!response.ok) {
+                throw new Error(path + ': ' + response.status);
+            }
+            return response.json();
+        });
+    }
+
+    function plot(id, figure) {
+        return Plotly.react(id, figure.data, figure.layout, figure.config || {});
+    }
+
+    function slug(text) {
+        return String(text).toLowerCase().replace(/[^a-z0-9]+/g, '-');
+    }
+
+    function selected(id) {
+        return Array.prototype.map.call(document.getElementById(id).selectedOptions, function(o) { return o.value; });
+    }
+
+    // Choropleth: the geometry comes once, the slider swaps the per-year values in place
+    var mapFigure = null;
+    var yearValues = null;
+    var slider = document.getElementById('year-slider');
+    var sliderOutput = document.querySelector('output[for="year-slider"]');
+
+    Promise.all([getJSON('figures/choropleth.json'), getJSON('data/year-values.json')]).then(function(loaded) {
+        mapFigure = loaded[0];
+        yearValues = loaded[1];
+        return plot('choropleth-map', mapFigure);
+    }).then(function() {
+        setYear(slider.value);
+        document.getElementById('choropleth-map').on('plotly_click', function(event) {
+            var point = event.points && event.points[0];
+            if (point && point.location) {
+                getJSON('figures/stacked/' + point.location + '.json').then(function(figure) {
+                    plot('stacked-bar-chart', figure);
+                }).catch(function() {});
+            }
+        });
+    });
+
+    function setYear(value) {
+        sliderOutput.textContent = value;
+        if (!mapFigure || !yearValues) {
+            return;
+        }
+        var figure = window.dash_clientside.choropleth.set_year(Number(value), mapFigure, yearValues);
+        if (figure) {
+            mapFigure = figure;
+            plot('choropleth-map', mapFigure);
+        }
+    }
+    slider.addEventListener('input', function() { setYear(slider.value); });
+
+    // All-countries trend chart
+    getJSON('figures/line-chartall.json').then(function(figure) { plot('line-chartall', figure); });
+
+    // Country selection: selections are combinatorial, so the lines are drawn from the trend matrix
+    var trend = null;
+    function drawTrend() {
+        var rows = {};
+        trend.names.forEach(function(name, i) { rows[name] = i; });
+        var traces = selected('country-dropdown').filter(function(name) {
+            return rows[name] !== undefined;
+        }).map(function(name) {
+            return {type: 'scatter', mode: 'lines', connectgaps: true, name: name, x: trend.years, y: trend.values[rows[name]]};
+        });
+        plot('line-chart', {data: traces, layout: {
+            title: {text: 'GHG Emission Over Time'},
+            legend: {title: {text: 'Countries'}},
+            xaxis: {title: {text: 'Year'}},
+            yaxis: {title: {text: 'Total GHG emitted'}}
+        }});
+    }
+    getJSON('data/trend.json').then(function(loaded) {
+        trend = loaded;
+        drawTrend();
+    });
+    document.getElementById('country-dropdown').addEventListener('change', function() {
+        if (trend) {
+            drawTrend();
+        }
+    });
+
+    // Diverging chart: one file per metric, gas and base-target window
+    getJSON('figures/diverging/default.json').then(function(figure) { plot('diverging-bar-chart', figure); });
+
+    function updateDiverging() {
+        var base = selected('diverging-base-year')[0];
+        var target = selected('diverging-target-year')[0];
+        var gas = selected('diverging-gas')[0];
+        var metric = document.querySelector('input[name="diverging-metric"]:checked').value;
+        getJSON('figures/diverging/' + metric + '/' + slug(gas) + '/' + base + '-' + target + '.json').catch(function() {
+            return {data: [], layout: {title: {text: 'This window was not pre-rendered'}}};
+        }).then(function(figure) {
+            plot('diverging-bar-chart', figure);
+        });
+    }
+    ['diverging-base-year', 'diverging-target-year', 'diverging-gas'].forEach(function(id) {
+        document.getElementById(id).addEventListener('change', updateDiverging);
+    });
+    document.querySelectorAll('input[name="diverging-metric"]').forEach(function(input) {
+        input.addEventListener('change', updateDiverging);
+    });
+})();
@@ -0,0 +1,37 @@
+import pytest
+
+
+@pytest.fixture
+def small_data():
+    """A GHGData over two countries and one aggregate ('Africa', no ADM0_A3) for 2020-2021."""
+    np = pytest.importorskip("numpy")
+    pd = pytest.importorskip("pandas")
+    gpd = pytest.importorskip("geopandas")
+    shapely = pytest.importorskip("shapely")
+    pytest.importorskip("plotly")
+    from gas_index import GAS_COLUMNS
+    from ghg_data import GHGData
+
+    rows = [
+        ("Aland", "ALA", 2020, 1.0), ("Aland", "ALA", 2021, 2.0),
+        ("Borduria", "BOR", 2020, 3.0), ("Borduria", "BOR", 2021, 4.0),
+        ("Africa", np.nan, 2020, 10.0), ("Africa", np.nan, 2021, 11.0),
+    ]
+    panel = pd.DataFrame(rows, columns=["ADMIN", "ADM0_A3", "Year", "Total GHG emitted"])
+    for i, gas in enumerate(GAS_COLUMNS):
+        panel[gas] = panel["Total GHG emitted"] / (i + 2)
+
+    countries = gpd.GeoDataFrame({
+        "ADM0_A3": ["ALA", "BOR"],
+        "ADMIN": ["Aland", "Borduria"],
+        "ISO_A3": ["ALA", "-99"],
+        "NAME": ["Aland", "Borduria"],
+        "NAME_LONG": ["Aland", "Borduria"],
+        "FORMAL_EN": ["Aland", "Republic of Borduria"],
+        "REGION_UN": ["Europe", "Europe"],
+        "geometry": [shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1)],
+    }, crs="EPSG:4326")
+
+    data = GHGData(workbook_path="unused.xlsx", countries_path="unused.shp")
+    data.swap({"df_GHG_per_gas": panel, "zaworld": countries, "workbook_key": "test"})
+    return data
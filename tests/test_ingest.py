@@ -0,0 +1,37 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("geopandas")
+
+from gas_index import GAS_COLUMNS  # noqa: E402
+from ingest import ingest  # noqa: E402
+
+VALUE = "Total GHG emitted"
+
+
+def rows(*records):
+    df = pd.DataFrame(records, columns=["ADM0_A3", "Year", VALUE])
+    for i, gas in enumerate(GAS_COLUMNS):
+        df[gas] = df[VALUE] / (i + 2)
+    return df
+
+
+def test_incremental_products_match_a_full_rebuild(small_data):
+    # Build the products the incremental path updates
+    small_data.GHGtrend, small_data.df_GHG_per_gas_tidy, small_data.merged_df
+
+    # An in-file duplicate (the last row wins) and a new year
+    ingest(small_data, rows(("ALA", 2021, 7.0), ("ALA", 2021, 8.0), ("BOR", 2022, 5.0)))
+
+    panel = small_data.df_GHG_per_gas
+    assert panel.loc[(panel["ADM0_A3"] == "ALA") & (panel["Year"] == 2021), VALUE].tolist() == [8.0]
+
+    trend = panel.groupby(["Year", "ADMIN"])[VALUE].sum().reset_index()
+    pd.testing.assert_frame_equal(small_data.GHGtrend.reset_index(drop=True), trend)
+
+    tidy = panel.pivot_table(index="ADM0_A3", columns="Year", values=VALUE).reset_index()
+    pd.testing.assert_frame_equal(small_data.df_GHG_per_gas_tidy, tidy, check_names=False)
+
+    merged = small_data.merged_df.set_index("ADM0_A3")
+    assert merged.loc["ALA", 2021] == 8.0
+    assert merged.loc["BOR", 2022] == 5.0
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("geopandas")
+
+import geometry_store  # noqa: E402
+from ghg_data import GHGData  # noqa: E402
+from shared_dataset import attach, export  # noqa: E402
+
+
+def test_export_attach_round_trip(small_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(geometry_store, "GEOMETRY_DIR", str(tmp_path / "geometry"))
+    path = export(small_data, str(tmp_path / "shared.bin"))
+
+    attached = GHGData(workbook_path="unused.xlsx", countries_path="unused.shp")
+    attach(attached, path)
+
+    panel = attached.df_GHG_per_gas
+    assert panel["ADM0_A3"].isna().sum() == 2
+    assert set(panel.loc[panel["ADM0_A3"].isna(), "ADMIN"]) == {"Africa"}
+    assert attached.year_values == small_data.year_values
+    assert {f["id"] for f in attached.geojson("low")["features"]} == {"ALA", "BOR"}
+
+    countries = attached.country_index
+    assert countries.panel_names[countries.lookup("BOR")] == "Borduria"
+    assert countries.locate(0.5, 1.5) == countries.lookup("BOR")
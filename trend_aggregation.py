@@ -0,0 +1,143 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+VALUE = "Total GHG emitted"
+OTHERS = "Others"
+
+# Our World in Data aggregates would double count in any ranking or rollup of countries.
+# Continents and income groups (Africa, Asia, High-income countries, ...) have no ADM0_A3
+# in the panel and the World is OWID_WRL; other OWID_ codes are countries, e.g. Kosovo (OWID_KOS).
+AGGREGATE_CODES = {"OWID_WRL"}
+
+# Above this many traces the figure switches to WebGL (Scattergl) rendering
+WEBGL_THRESHOLD = 50
+
+
+def is_aggregate(codes):
+    """Boolean mask of the ADM0_A3 values (a Series) that belong to aggregates."""
+    return codes.isna() | codes.astype(str).str.strip().isin(["", *AGGREGATE_CODES])
+
+
+def aggregate_entities(panel):
+    return set(panel.loc[is_aggregate(panel["ADM0_A3"]), "ADMIN"])
+
+
+def rank_entities(trend, key="ADMIN", exclude=()):
+    totals = trend.groupby(key)[VALUE].sum()
+    totals = totals[~totals.index.isin(list(exclude))]
+    return totals.sort_values(ascending=False).index
+
+
+def top_n_with_others(trend, n=10, key="ADMIN", exclude=()):
+    """Keep the n largest emitters and sum everyone else into a single 'Others' series."""
+    trend = trend[~trend[key].isin(list(exclude))]
+    top = rank_entities(trend, key)[:n]
+    is_top = trend[key].isin(top)
+    others = trend[~is_top].groupby("Year", as_index=False)[VALUE].sum()
+    others[key] = OTHERS
+    out = pd.concat([trend[is_top], others[["Year", key, VALUE]]], ignore_index=True)
+    order = list(top) + ([OTHERS] if len(others) else [])
+    return out, order
+
+
+def regional_rollup(panel, regions, key="ADMIN"):
+    """Sum the panel per region per year; regions maps ADM0_A3 to a region name."""
+    panel = panel[~is_aggregate(panel["ADM0_A3"])]
+    region = panel["ADM0_A3"].map(regions).fillna(OTHERS)
+    out = panel.groupby(["Year", region.rename(key)])[VALUE].sum().reset_index()
+    order = list(rank_entities(out, key, exclude=[OTHERS]))
+    if (out[key] == OTHERS).any():
+        order.append(OTHERS)
+    return out, order
+
+
+def trend_figure(trend, order, key="ADMIN", title="", markers=True, webgl=None):
+    """One trace per entity in order, built straight from arrays; 'Others' is drawn as a grey band."""
+    if webgl is None:
+        webgl = len(order) > WEBGL_THRESHOLD
+    scatter = go.Scattergl if webgl else go.Scatter
+    mode = "lines+markers" if markers else "lines"
+
+    trend = trend.sort_values([key, "Year"], kind="mergesort")
+    keys = trend[key].to_numpy()
+    years = trend["Year"].to_numpy()
+    values = trend[VALUE].to_numpy(dtype=np.float64)
+    starts = np.searchsorted(keys, order, side="left") if len(keys) else []
+    stops = np.searchsorted(keys, order, side="right") if len(keys) else []
+
+    fig = go.Figure()
+    for name, start, stop in zip(order, starts, stops):
+        if name == OTHERS:
+            fig.add_trace(scatter(
+                x=years[start:stop], y=values[start:stop], name=name, mode="lines",
+                fill="tozeroy", line=dict(color="rgba(150, 150, 150, 0.8)", width=1),
+                fillcolor="rgba(150, 150, 150, 0.25)",
+            ))
+        else:
+            fig.add_trace(scatter(x=years[start:stop], y=values[start:stop], name=name, mode=mode))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Year",
+        yaxis_title=VALUE,
+        legend_title_text=key,
+    )
+    return fig
+
+
+class TrendMatrix:
+    """GHGtrend as a dense country x year matrix, for the multi-select line chart.
+
+    A selection is answered by gathering rows through the country -> row index,
+    and the figures of recently requested selections are memoized.
+    """
+
+    def __init__(self, trend, key="ADMIN", memo_size=32):
+        wide = trend.pivot_table(index=key, columns="Year", values=VALUE, aggfunc="sum")
+        self.key = key
+        self.years = wide.columns.to_numpy()
+        self.matrix = np.ascontiguousarray(wide.to_numpy(dtype=np.float64))
+        self.rows = {name: i for i, name in enumerate(wide.index)}
+        self._figure = functools.lru_cache(maxsize=memo_size)(self._build)
+
+    @classmethod
+    def from_arrays(cls, years, matrix, names, key="ADMIN", memo_size=32):
+        # Rebuild around existing arrays (e.g. views of a shared memory region)
+        self = cls.__new__(cls)
+        self.key = key
+        self.years = years
+        self.matrix = matrix
+        self.rows = {name: i for i, name in enumerate(names)}
+        self._figure = functools.lru_cache(maxsize=memo_size)(self._build)
+        return self
+
+    def names(self):
+        return list(self.rows)
+
+    def clear(self):
+        self._figure.cache_clear()
+
+    def gather(self, selection):
+        """Return the selected names that exist and their rows of the matrix."""
+        names = [name for name in selection if name in self.rows]
+        return names, self.matrix[[self.rows[name] for name in names]]
+
+    def figure(self, selection, title="GHG Emission Over Time", legend_title="Countries"):
+        # Normalise to a tuple so equal selections share one memo entry
+        return self._figure(tuple(dict.fromkeys(selection)), title, legend_title)
+
+    def _build(self, selection, title, legend_title):
+        names, rows = self.gather(selection)
+        fig = go.Figure([
+            go.Scatter(x=self.years, y=row, name=name, mode="lines", connectgaps=True)
+            for name, row in zip(names, rows)
+        ])
+        fig.update_layout(
+            title=title,
+            xaxis_title="Year",
+            yaxis_title=VALUE,
+            legend_title_text=legend_title,
+        )
+        return fig